@@ -0,0 +1,129 @@
+import threading
+import time
+
+# Requisição recusada sem executar (fila cheia ou sem vaga dentro do prazo)
+class Overloaded(RuntimeError):
+    def __init__(self, cost_class, reason, retry_after):
+        super().__init__(f'Server busy ({cost_class} {reason}), retry in {retry_after}s')
+        self.cost_class = cost_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+# Prazo da requisição esgotado no meio do processamento
+class DeadlineExceeded(RuntimeError):
+    pass
+
+# Prazo absoluto de uma requisição (monotônico); timeout 0 = sem prazo
+class Deadline:
+    __slots__ = ('expires_at',)
+
+    def __init__(self, timeout):
+        self.expires_at = time.monotonic() + timeout if timeout else None
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self, stage):
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded(f'Request deadline exceeded during {stage}')
+
+# Limite de concorrência com fila de espera limitada para uma classe de custo
+class _CostClass:
+    def __init__(self, name, concurrency, queue_size, retry_after):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        with self._condition:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                raise Overloaded(self.name, 'queue full', self.retry_after)
+
+            self.waiting += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.concurrency, timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.timed_out += 1
+                raise Overloaded(self.name, 'queue timeout', self.retry_after)
+            self.active += 1
+            self.admitted += 1
+            # Várias vagas liberadas de uma vez: acorda o próximo da fila
+            if self.active < self.concurrency and self.waiting:
+                self._condition.notify()
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'concurrency': self.concurrency,
+                'queue_size': self.queue_size,
+                'active': self.active,
+                'queue_depth': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out
+            }
+
+# Controle de admissão por worker: cada classe de custo (texto, PDF) tem vagas
+# e fila próprias, então uploads pesados não atrasam as requisições baratas
+class AdmissionController:
+    def __init__(self, classes, max_queue_wait=None):
+        self.classes = {
+            name: _CostClass(name, concurrency, queue_size, retry_after)
+            for name, (concurrency, queue_size, retry_after) in classes.items()
+        }
+        self.max_queue_wait = max_queue_wait
+        self.deadline_exceeded = 0
+
+    def admit(self, cost_class, deadline=None):
+        """Context manager que ocupa uma vaga da classe (Overloaded se não houver)"""
+        return _Admission(self, self.classes[cost_class], deadline)
+
+    def record_deadline_exceeded(self):
+        self.deadline_exceeded += 1
+
+    def stats(self):
+        stats = {name: cost_class.stats() for name, cost_class in self.classes.items()}
+        stats['deadline_exceeded'] = self.deadline_exceeded
+        return stats
+
+class _Admission:
+    __slots__ = ('controller', 'cost_class', 'deadline')
+
+    def __init__(self, controller, cost_class, deadline):
+        self.controller = controller
+        self.cost_class = cost_class
+        self.deadline = deadline
+
+    def __enter__(self):
+        # A espera na fila também consome o prazo da requisição
+        timeout = self.controller.max_queue_wait
+        remaining = self.deadline.remaining() if self.deadline is not None else None
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        self.cost_class.acquire(timeout)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cost_class.release()
+        return False
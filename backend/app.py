@@ -1,17 +1,32 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 from werkzeug.utils import secure_filename
-import PyPDF2
+from werkzeug.exceptions import RequestEntityTooLarge
 import io
+import codecs
+import functools
 import re
+import threading
+import zipfile
+import json
+import time
 import logging
+import numpy as np
 from dotenv import load_dotenv
-try:
-    from textblob import TextBlob
-    TEXTBLOB_AVAILABLE = True
-except ImportError:
-    TEXTBLOB_AVAILABLE = False
+from result_cache import ResultCache, SQLiteCacheBackend, text_digest
+from sentiment import create_sentiment_engine, textblob_installed
+from text_features import (
+    MAX_PROCESSED_WORDS, compute_features, feature_window_chars, preprocess_text
+)
+from metrics import MetricsRegistry, LATENCY_BUCKETS, SIZE_BUCKETS
+from mailbox_ingest import iter_archive_messages, parse_message
+from jobs import JobStore, JobManager, JobInputError, JobQueueFull
+from linear_model import HashedLinearModel, DEFAULT_MODEL_PATH
+from near_duplicate import NearDuplicateIndex, simhash
+from admission import AdmissionController, Deadline, DeadlineExceeded, Overloaded
+from serialization import negotiate, encode, parse_fields, project, gzip_body
+from profiling import RequestProfiler, TRACE_SUFFIX, PSTATS_SUFFIX
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -21,10 +36,12 @@ CORS(app,
      origins=[
          "http://localhost:5173",
          "https://email-classifier.vercel.app",
-         "https://*.vercel.app",
+         # Previews da Vercel: o Flask-CORS trata a entrada como regex (ancorada
+         # para não aceitar hosts como x.vercel.app.example.com)
+         r"^https://[\w-]+\.vercel\.app$",
          "https://email-sorter-pi.vercel.app"
      ],
-     methods=["GET", "POST", "OPTIONS"],
+     methods=["GET", "POST", "DELETE", "OPTIONS"],
      allow_headers=["Content-Type", "Authorization"],
      supports_credentials=True)
 
@@ -45,227 +62,558 @@ logger = logging.getLogger(__name__)
 # Configuração de upload
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'txt', 'pdf'}
+MAILBOX_EXTENSIONS = {'mbox', 'zip'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 
+# Limites de extração de texto: o pré-processamento mantém só as primeiras
+# MAX_PROCESSED_WORDS palavras, então o PDF não precisa ser lido além disso
+PDF_MAX_WORDS = int(os.environ.get('PDF_MAX_WORDS', MAX_PROCESSED_WORDS))
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', 50))
+PDF_TIMEOUT_SECONDS = float(os.environ.get('PDF_TIMEOUT_SECONDS', 5))
+
+# Janela de caracteres usada no cálculo das features: o custo por requisição
+# fica constante mesmo para uploads muito grandes
+FEATURE_WINDOW_CHARS = feature_window_chars()
+
+# Uploads .txt: só os bytes que podem cair na janela de features são lidos
+# (até 4 bytes por caractere em UTF-8)
+TXT_MAX_BYTES = int(os.environ.get('TXT_MAX_BYTES', 4 * FEATURE_WINDOW_CHARS))
+
+# Limite de emails por requisição em /api/analyze/batch
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+
+# Importação de caixas de email (/api/analyze/mailbox): o limite de 16MB não se
+# aplica, o arquivo é lido em streaming e só uma mensagem fica em memória
+MAILBOX_MAX_BYTES = int(os.environ.get('MAILBOX_MAX_BYTES', 4 * 1024 * 1024 * 1024))
+MAILBOX_MAX_MESSAGE_BYTES = int(os.environ.get('MAILBOX_MAX_MESSAGE_BYTES', 1024 * 1024))
+MAILBOX_BATCH_SIZE = int(os.environ.get('MAILBOX_BATCH_SIZE', 16))
+
+# Cache de resultados por digest do texto (RESULT_CACHE_PATH ativa o backend
+# compartilhado em SQLite entre os workers)
+RESULT_CACHE_MAX_MB = float(os.environ.get('RESULT_CACHE_MAX_MB', 16))
+RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 3600))
+RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', '')
+
+# Índice de quase-duplicatas (SimHash): emails de um mesmo template reutilizam a
+# classificação anterior; NEAR_DUPLICATE_MAX_ENTRIES=0 desativa
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.environ.get('NEAR_DUPLICATE_MAX_ENTRIES', 10000))
+NEAR_DUPLICATE_SIMILARITY = float(os.environ.get('NEAR_DUPLICATE_SIMILARITY', 0.87))
+NEAR_DUPLICATE_MIN_WORDS = int(os.environ.get('NEAR_DUPLICATE_MIN_WORDS', 20))
+
+# Controle de admissão por worker (útil com workers gthread / --threads): vagas e
+# fila separadas para texto, PDF/lote e mailbox; excedente recebe 503 com Retry-After
+ADMISSION_TEXT_CONCURRENCY = int(os.environ.get('ADMISSION_TEXT_CONCURRENCY', 8))
+ADMISSION_TEXT_QUEUE = int(os.environ.get('ADMISSION_TEXT_QUEUE', 32))
+ADMISSION_PDF_CONCURRENCY = int(os.environ.get('ADMISSION_PDF_CONCURRENCY', 2))
+ADMISSION_PDF_QUEUE = int(os.environ.get('ADMISSION_PDF_QUEUE', 4))
+# O mailbox ocupa a vaga durante todo o streaming (pode levar minutos)
+ADMISSION_MAILBOX_CONCURRENCY = int(os.environ.get('ADMISSION_MAILBOX_CONCURRENCY', 1))
+ADMISSION_MAILBOX_QUEUE = int(os.environ.get('ADMISSION_MAILBOX_QUEUE', 2))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5))
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 2))
+
+# Prazo total da requisição, abaixo do timeout do proxy (0 desativa)
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 25))
+
+# Classifica exemplos na importação do app, antes de receber tráfego (com
+# gunicorn --preload isso acontece uma vez no master e é herdado pelos workers)
+STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', 'false').lower() in ('1', 'true', 'yes')
+
+# Motor de sentimento: 'lexicon' (embutido), 'textblob' (referência opcional) ou 'none'
+SENTIMENT_ENGINE = os.environ.get('SENTIMENT_ENGINE', 'lexicon')
+
+# Motor de classificação: 'lightweight_ai' (padrão), 'linear' (modelo treinado
+# com `python linear_model.py train`) ou 'rules'
+CLASSIFIER_ENGINE = os.environ.get('CLASSIFIER_ENGINE', 'lightweight_ai')
+LINEAR_MODEL_PATH = os.environ.get('LINEAR_MODEL_PATH', DEFAULT_MODEL_PATH)
+
+# Métricas Prometheus (METRICS_DIR soma os dados de todos os workers do gunicorn)
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+# Modo assíncrono (async=true ou "Prefer: respond-async"): PDFs e textos acima de
+# JOB_ASYNC_MIN_BYTES vão para um pool local de processos; JOB_WORKERS=0 desativa
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 32))
+JOB_TTL = int(os.environ.get('JOB_TTL', 3600))
+JOB_ASYNC_MIN_BYTES = int(os.environ.get('JOB_ASYNC_MIN_BYTES', 256 * 1024))
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', os.path.join(UPLOAD_FOLDER, 'jobs.sqlite3'))
+
+# Respostas JSON/MessagePack a partir deste tamanho saem com gzip quando o
+# cliente aceita (0 desativa)
+RESPONSE_GZIP_MIN_BYTES = int(os.environ.get('RESPONSE_GZIP_MIN_BYTES', 1024))
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', 5))
+
+# Profiling sob demanda de /api/analyze: header "X-Profile-Token: <PROFILE_TOKEN>"
+# ou amostragem (PROFILE_SAMPLE_RATE); amostras mais rápidas que PROFILE_SLOW_MS
+# são descartadas. Sem PROFILE_DIR (ou sem token e sem amostragem) fica desligado
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '')
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 500))
+PROFILE_MAX_TRACES = int(os.environ.get('PROFILE_MAX_TRACES', 50))
+
 # Criar pasta de uploads
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+def _trie_regex(words):
+    """Monta uma alternância em forma de trie; a alternativa mais longa vem primeiro"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+# Matcher compilado uma única vez para palavras-chave e padrões
+class KeywordMatcher:
+    def __init__(self, productive_keywords, nonproductive_keywords, patterns):
+        self.productive_keywords = frozenset(productive_keywords)
+        self.nonproductive_keywords = frozenset(nonproductive_keywords)
+        keywords = sorted(self.productive_keywords | self.nonproductive_keywords)
+        
+        # Lookahead: uma única varredura encontra ocorrências sobrepostas
+        # (ex.: 'thanks' contém 'thank'), como o antigo teste `keyword in text`
+        self.keyword_regex = re.compile('(?=(' + _trie_regex(keywords) + '))') if keywords else None
+        
+        # Em cada posição só a palavra mais longa é capturada; as demais
+        # palavras-chave que casam ali são prefixos dela
+        self.keyword_prefixes = {
+            keyword: tuple(other for other in keywords if keyword.startswith(other))
+            for keyword in keywords
+        }
+        
+        # O texto chega em minúsculas: para texto ASCII o IGNORECASE é
+        # redundante e custa ~2x no sre; fica apenas como fallback Unicode
+        self.patterns = tuple(
+            re.compile(pattern, re.IGNORECASE if re.search(r'(?<!\\)[A-Z]', pattern) else 0)
+            for pattern in patterns
+        )
+        self.unicode_patterns = tuple(re.compile(pattern, re.IGNORECASE) for pattern in patterns)
+
+    def count(self, text_lower):
+        """Retorna (produtivas, não-produtivas, padrões) em uma passada por palavras-chave"""
+        found = set()
+        if self.keyword_regex is not None:
+            for keyword in set(self.keyword_regex.findall(text_lower)):
+                found.update(self.keyword_prefixes[keyword])
+        
+        patterns = self.patterns if text_lower.isascii() else self.unicode_patterns
+        pattern_matches = sum(1 for pattern in patterns if pattern.search(text_lower))
+        
+        return (
+            len(found & self.productive_keywords),
+            len(found & self.nonproductive_keywords),
+            pattern_matches
+        )
+
 # Classificador leve baseado em regras e análise de texto
 class LightweightClassifier:
     def __init__(self):
-        self.textblob_available = TEXTBLOB_AVAILABLE
+        self.textblob_available = textblob_installed()
+        self.sentiment = create_sentiment_engine(SENTIMENT_ENGINE)
+        self.sentiment_engine = self.sentiment.name if self.sentiment is not None else 'none'
         logger.info(f"Initializing lightweight classifier")
         logger.info(f"TextBlob available: {self.textblob_available}")
+        logger.info(f"Sentiment engine: {self.sentiment_engine}")
         
+        # Tabelas imutáveis: depois do fork (gunicorn --preload) continuam
+        # compartilhadas entre os workers
         # Palavras-chave categorizadas para classificação
-        self.productive_keywords = {
+        self.productive_keywords = frozenset({
             'urgent', 'help', 'support', 'issue', 'problem', 'error', 'bug',
             'question', 'assistance', 'request', 'deadline', 'fix', 'repair',
             'technical', 'account', 'access', 'login', 'password', 'payment',
             'troubleshoot', 'system', 'application', 'website', 'service',
             'broken', 'not working', 'failing', 'crash', 'stuck', 'blocked',
             'asap', 'immediately', 'priority', 'critical', 'emergency'
-        }
+        })
         
-        self.nonproductive_keywords = {
+        self.nonproductive_keywords = frozenset({
             'thank', 'thanks', 'grateful', 'appreciate', 'congratulations',
             'birthday', 'holiday', 'vacation', 'celebrate', 'party', 'social',
             'greeting', 'hello', 'hi', 'good morning', 'good afternoon',
             'welcome', 'wishes', 'best regards', 'cheers', 'love', 'miss you',
             'hope you are well', 'how are you', 'long time no see', 'catch up'
-        }
+        })
         
         # Padrões de email produtivos
-        self.productive_patterns = [
+        self.productive_patterns = (
             r'\b(error|bug|issue)\s+(#?\w+)',  # Error codes
             r'(can\'?t|cannot|unable to)\s+\w+',  # Cannot do something
             r'\b(fix|resolve|solve|repair)\b',  # Action requests
             r'\?\s*$',  # Questions
             r'deadline\s+\w+',  # Deadlines
             r'urgent|asap|immediately',  # Urgency
-        ]
+        )
+        
+        self.matcher = KeywordMatcher(
+            self.productive_keywords,
+            self.nonproductive_keywords,
+            self.productive_patterns
+        )
         
         logger.info("Lightweight classifier initialized successfully")
 
 # Instância global do classificador
 classifier = LightweightClassifier()
 
+# Modelo linear mapeado em memória uma única vez (com --preload as páginas
+# são compartilhadas por todos os workers)
+linear_model = None
+if CLASSIFIER_ENGINE == 'linear':
+    try:
+        linear_model = HashedLinearModel.load(LINEAR_MODEL_PATH)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not load linear model, falling back to lightweight_ai: {e}")
+        CLASSIFIER_ENGINE = 'lightweight_ai'
+elif CLASSIFIER_ENGINE not in ('lightweight_ai', 'rules'):
+    logger.warning(f"Unknown classifier engine '{CLASSIFIER_ENGINE}', using lightweight_ai")
+    CLASSIFIER_ENGINE = 'lightweight_ai'
+
+MODEL_INFO_METHODS = {
+    'lightweight_ai': 'rule_based_with_sentiment',
+    'linear': 'hashed_logistic_regression',
+    'rules': 'rule_based'
+}
+
+# Resultados em cache dependem do motor (e da versão do modelo)
+if CLASSIFIER_ENGINE == 'linear':
+    RESULT_CACHE_NAMESPACE = f'linear-{linear_model.fingerprint}'
+elif CLASSIFIER_ENGINE == 'rules':
+    RESULT_CACHE_NAMESPACE = 'rules-3.0.0'
+else:
+    RESULT_CACHE_NAMESPACE = f'lightweight-3.0.0-{SENTIMENT_ENGINE}'
+
+# Instância global do cache de resultados
+result_cache = ResultCache(
+    max_bytes=int(RESULT_CACHE_MAX_MB * 1024 * 1024),
+    ttl=RESULT_CACHE_TTL,
+    backend=SQLiteCacheBackend(RESULT_CACHE_PATH) if RESULT_CACHE_PATH else None
+)
+
+# Índice de quase-duplicatas dos emails classificados recentemente (por worker)
+near_duplicate_index = NearDuplicateIndex(
+    max_entries=NEAR_DUPLICATE_MAX_ENTRIES,
+    similarity=NEAR_DUPLICATE_SIMILARITY,
+    min_words=NEAR_DUPLICATE_MIN_WORDS
+)
+
+# Controle de admissão das rotas de análise
+admission = AdmissionController({
+    'text': (ADMISSION_TEXT_CONCURRENCY, ADMISSION_TEXT_QUEUE, ADMISSION_RETRY_AFTER),
+    'pdf': (ADMISSION_PDF_CONCURRENCY, ADMISSION_PDF_QUEUE, ADMISSION_RETRY_AFTER),
+    'mailbox': (ADMISSION_MAILBOX_CONCURRENCY, ADMISSION_MAILBOX_QUEUE, ADMISSION_RETRY_AFTER)
+}, max_queue_wait=ADMISSION_QUEUE_TIMEOUT)
+
+# Métricas por etapa de analyze_email, contadores por método e tamanho do payload
+app_metrics = MetricsRegistry('email_classifier', directory=METRICS_DIR or None)
+app_metrics.histogram('stage_seconds', 'Latency of each analyze_email stage in seconds.', LATENCY_BUCKETS)
+app_metrics.histogram('payload_bytes', 'Size of analyze request bodies in bytes.', SIZE_BUCKETS)
+app_metrics.counter('requests_total', 'Analyzed emails by classification method.')
+app_metrics.counter('errors_total', 'Classification and request errors by method.')
+app_metrics.counter('jobs_total', 'Async analysis jobs by submission outcome.')
+app_metrics.counter('near_duplicate_lookups_total', 'Near-duplicate index lookups by result.')
+app_metrics.counter('admission_rejections_total', 'Requests shed by admission control by cost class and reason.')
+
+# Jobs assíncronos (o pool de processos só é criado no primeiro job de cada worker)
+job_manager = JobManager(
+    JobStore(JOB_STORE_PATH) if JOB_WORKERS > 0 else None,
+    workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    ttl=JOB_TTL,
+    # Os processos do pool importam este módulo para executar process_analysis_job
+    preload=(__name__,)
+)
+
+# Traces de profiling das requisições lentas (diretório local com rotação)
+request_profiler = RequestProfiler(
+    PROFILE_DIR,
+    token=PROFILE_TOKEN,
+    sample_rate=PROFILE_SAMPLE_RATE,
+    slow_ms=PROFILE_SLOW_MS,
+    max_traces=PROFILE_MAX_TRACES
+)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf(file_stream):
-    """Extrai texto de arquivo PDF"""
+def iter_pdf_pages(file_stream, max_pages=None, timeout=None):
+    """Gera o texto do PDF página a página, parando nos limites de páginas e tempo"""
+    # Importado no primeiro PDF: o PyPDF2 é a dependência mais pesada da inicialização
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(file_stream)
+    deadline = time.monotonic() + timeout if timeout else None
+    
+    for page_number, page in enumerate(pdf_reader.pages):
+        if max_pages and page_number >= max_pages:
+            logger.warning(f"PDF page limit reached ({max_pages} pages)")
+            return
+        if deadline is not None and time.monotonic() > deadline:
+            logger.warning(f"PDF extraction time limit reached after {page_number} pages")
+            return
+        yield page.extract_text() or ""
+
+def extract_text_from_pdf(file_stream, max_words=PDF_MAX_WORDS, max_pages=PDF_MAX_PAGES,
+                          timeout=PDF_TIMEOUT_SECONDS):
+    """Extrai texto de arquivo PDF até reunir palavras suficientes para a classificação"""
     try:
-        pdf_reader = PyPDF2.PdfReader(file_stream)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        pages = []
+        word_count = 0
+        for page_text in iter_pdf_pages(file_stream, max_pages=max_pages, timeout=timeout):
+            pages.append(page_text)
+            word_count += len(page_text.split())
+            if max_words and word_count >= max_words:
+                break
+        return "\n".join(pages).strip()
     except Exception as e:
         logger.error(f"Error extracting PDF text: {e}")
         raise Exception("Could not read PDF file")
 
-def preprocess_text(text):
-    """Pré-processamento robusto do texto"""
-    try:
-        if not text or not isinstance(text, str):
-            return ""
-            
-        # Limpar texto básico mantendo pontuação importante
-        text = re.sub(r'[^\w\s.,!?-]', ' ', text)  
-        text = re.sub(r'\s+', ' ', text)           
-        text = text.strip()                       
-        
-        # Limitar tamanho para modelos Transformers (512 tokens)
-        words = text.split()
-        if len(words) > 400:  # Margem de segurança
-            text = ' '.join(words[:400])
-        
-        return text
-    except Exception as e:
-        logger.error(f"Error preprocessing text: {e}")
-        return str(text) if text else ""
+# Buffer de leitura reaproveitado entre as requisições de cada thread
+_upload_buffers = threading.local()
 
-def classify_with_lightweight_ai(text):
-    """Classificação leve usando TextBlob + regras avançadas"""
+# Codificações tentadas quando o arquivo não tem BOM; latin-1 aceita qualquer byte
+TEXT_FALLBACK_ENCODINGS = ('utf-8', 'latin-1')
+TEXT_BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be'))
+
+def read_text_upload(file_stream, max_bytes=TXT_MAX_BYTES):
+    """Lê o upload .txt uma única vez (até max_bytes) e decodifica sem cópias extras;
+    as codificações alternativas são tentadas sobre o mesmo buffer"""
+    buffer = getattr(_upload_buffers, 'buffer', None)
+    if buffer is None or len(buffer) != max_bytes:
+        buffer = _upload_buffers.buffer = bytearray(max_bytes)
+    
+    view = memoryview(buffer)
+    size = 0
+    while size < max_bytes:
+        read = file_stream.readinto(view[size:])
+        if not read:
+            break
+        size += read
+    truncated = size == max_bytes and bool(file_stream.read(1))
+    
+    data = view[:size]
+    encodings = TEXT_FALLBACK_ENCODINGS
+    for bom, encoding in TEXT_BOMS:
+        if data[:len(bom)] == bom:
+            data = data[len(bom):]
+            encodings = (encoding,) + TEXT_FALLBACK_ENCODINGS
+            break
+    
     try:
-        processed_text = preprocess_text(text)
-        if not processed_text:
-            return "Productive", 0.5, {'method': 'empty_text'}
-        
-        text_lower = text.lower()
-        analysis_details = {}
-        
-        # 1. Análise de sentimento com TextBlob (se disponível)
-        sentiment_score = 0.0
-        if classifier.textblob_available:
+        for encoding in encodings:
+            # Incremental: um caractere multibyte cortado no limite fica de fora em vez de dar erro
+            decoder = codecs.getincrementaldecoder(encoding)()
             try:
-                blob = TextBlob(processed_text)
-                sentiment_score = blob.sentiment.polarity  # -1 to 1
-                subjectivity = blob.sentiment.subjectivity  # 0 to 1
-                analysis_details['sentiment_polarity'] = round(sentiment_score, 3)
-                analysis_details['subjectivity'] = round(subjectivity, 3)
-            except Exception as e:
-                logger.warning(f"TextBlob analysis failed: {e}")
-        
-        # 2. Contagem de palavras-chave
-        productive_matches = sum(1 for keyword in classifier.productive_keywords if keyword in text_lower)
-        nonproductive_matches = sum(1 for keyword in classifier.nonproductive_keywords if keyword in text_lower)
-        
-        # 3. Análise de padrões usando regex
-        pattern_matches = 0
-        for pattern in classifier.productive_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                pattern_matches += 1
-        
-        # 4. Análise estrutural do texto
-        word_count = len(text.split())
-        sentence_count = len([s for s in text.split('.') if s.strip()])
-        question_count = text.count('?')
-        exclamation_count = text.count('!')
-        caps_ratio = sum(1 for c in text if c.isupper()) / max(len(text), 1)
-        
+                return decoder.decode(data, final=not truncated)
+            except UnicodeDecodeError:
+                continue
+    finally:
+        data.release()
+        view.release()
+
+def extract_features(text):
+    """Calcula as features estruturais uma única vez sobre uma janela limitada do texto"""
+    with app_metrics.stage('preprocessing'):
+        return _extract_features(text)
+
+def _extract_features(text):
+    return compute_features(text, FEATURE_WINDOW_CHARS)
+
+def extract_lightweight_features(features, with_sentiment=True):
+    """Completa o registro com sentimento e palavras-chave (False para texto vazio)"""
+    if not features.processed_text:
+        return False
+    
+    # 1. Análise de sentimento com o motor configurado (se disponível)
+    if with_sentiment and classifier.sentiment is not None:
+        try:
+            with app_metrics.stage('sentiment'):
+                # -1 to 1, 0 to 1
+                features.sentiment_polarity, features.subjectivity = classifier.sentiment.analyze(features.processed_text)
+        except Exception as e:
+            logger.warning(f"Sentiment analysis failed: {e}")
+    
+    # 2-3. Palavras-chave e padrões regex (matcher pré-compilado)
+    with app_metrics.stage('matching'):
+        (features.productive_keywords,
+         features.nonproductive_keywords,
+         features.pattern_matches) = classifier.matcher.count(features.text_lower)
+    return True
+
+def score_lightweight_batch(features):
+    """Calcula scores e decisão de vários emails de uma vez (colunas NumPy)"""
+    productive_matches = np.array([f.productive_keywords for f in features], dtype=np.float64)
+    nonproductive_matches = np.array([f.nonproductive_keywords for f in features], dtype=np.float64)
+    pattern_matches = np.array([f.pattern_matches for f in features], dtype=np.float64)
+    word_count = np.array([f.word_count for f in features], dtype=np.int64)
+    question_count = np.array([f.question_count for f in features], dtype=np.float64)
+    sentiment_score = np.array([f.sentiment_polarity or 0.0 for f in features], dtype=np.float64)
+    caps_ratio = np.array([f.caps_ratio for f in features], dtype=np.float64)
+    has_subjectivity = np.array([f.subjectivity is not None for f in features], dtype=bool)
+    subjectivity = np.array([
+        round(f.subjectivity, 3) if f.subjectivity is not None else 1.0 for f in features
+    ], dtype=np.float64)
+    
+    # 5. Cálculo de score de produtividade (mesma ordem de somas do cálculo escalar)
+    # Palavras-chave produtivas (peso alto) e padrões produtivos (peso médio)
+    productive_score = productive_matches * 0.3
+    productive_score = productive_score + pattern_matches * 0.2
+    
+    # Perguntas indicam necessidade de resposta
+    productive_score = productive_score + question_count * 0.15
+    
+    # Texto longo pode indicar problema complexo
+    productive_score = productive_score + np.where(word_count > 50, 0.1, 0.0)
+    productive_score = productive_score + np.where(word_count > 100, 0.1, 0.0)
+    
+    # Muitas maiúsculas podem indicar urgência
+    productive_score = productive_score + np.where(caps_ratio > 0.1, 0.1, 0.0)
+    
+    # Sentimento negativo pode indicar problema
+    productive_score = productive_score + np.where(sentiment_score < -0.2, 0.15, 0.0)
+    
+    # Score de não-produtividade: palavras-chave não-produtivas (peso alto)
+    has_nonproductive = nonproductive_matches > 0
+    nonproductive_score = nonproductive_matches * 0.4
+    
+    # Sentimento muito positivo pode ser social
+    nonproductive_score = nonproductive_score + np.where(sentiment_score > 0.3, 0.2, 0.0)
+    
+    # Mensagens muito curtas com agradecimentos
+    nonproductive_score = nonproductive_score + np.where((word_count < 30) & has_nonproductive, 0.3, 0.0)
+    
+    # Baixa subjetividade com palavras positivas
+    low_subjectivity = has_subjectivity & (subjectivity < 0.3) & has_nonproductive
+    nonproductive_score = nonproductive_score + np.where(low_subjectivity, 0.2, 0.0)
+    
+    # 6. Decisão final
+    is_productive = productive_score > nonproductive_score
+    winning_score = np.where(is_productive, productive_score, nonproductive_score)
+    confidence = np.minimum(0.95, 0.6 + (winning_score * 0.8))
+    
+    # Ajustar confiança baseada na diferença de scores
+    score_diff = np.abs(productive_score - nonproductive_score)
+    confidence = np.where(score_diff > 0.5, np.minimum(0.95, confidence + 0.1), confidence)
+    
+    results = []
+    for i, feature in enumerate(features):
+        analysis_details = feature.analysis_details()
         analysis_details.update({
-            'productive_keywords': productive_matches,
-            'nonproductive_keywords': nonproductive_matches,
-            'pattern_matches': pattern_matches,
-            'word_count': word_count,
-            'question_count': question_count,
-            'exclamation_count': exclamation_count,
-            'caps_ratio': round(caps_ratio, 3)
+            'productive_score': round(float(productive_score[i]), 3),
+            'nonproductive_score': round(float(nonproductive_score[i]), 3),
+            'score_difference': round(float(score_diff[i]), 3),
+            'method': 'lightweight_ai'
         })
-        
-        # 5. Cálculo de score de produtividade
-        productive_score = 0.0
-        
-        # Palavras-chave produtivas (peso alto)
-        productive_score += productive_matches * 0.3
-        
-        # Padrões produtivos (peso médio)
-        productive_score += pattern_matches * 0.2
-        
-        # Perguntas indicam necessidade de resposta
-        productive_score += question_count * 0.15
-        
-        # Texto longo pode indicar problema complexo
-        if word_count > 50:
-            productive_score += 0.1
-        if word_count > 100:
-            productive_score += 0.1
-        
-        # Muitas maiúsculas podem indicar urgência
-        if caps_ratio > 0.1:
-            productive_score += 0.1
-        
-        # Sentimento negativo pode indicar problema
-        if sentiment_score < -0.2:
-            productive_score += 0.15
-        
-        # Score de não-produtividade
-        nonproductive_score = 0.0
-        
-        # Palavras-chave não-produtivas (peso alto)
-        nonproductive_score += nonproductive_matches * 0.4
-        
-        # Sentimento muito positivo pode ser social
-        if sentiment_score > 0.3:
-            nonproductive_score += 0.2
-        
-        # Mensagens muito curtas com agradecimentos
-        if word_count < 30 and nonproductive_matches > 0:
-            nonproductive_score += 0.3
-        
-        # Baixa subjetividade com palavras positivas
-        if classifier.textblob_available and 'subjectivity' in analysis_details:
-            if analysis_details['subjectivity'] < 0.3 and nonproductive_matches > 0:
-                nonproductive_score += 0.2
-        
-        # 6. Decisão final
-        if productive_score > nonproductive_score:
-            classification = "Productive"
-            confidence = min(0.95, 0.6 + (productive_score * 0.8))
-        else:
-            classification = "Non-Productive"  
-            confidence = min(0.95, 0.6 + (nonproductive_score * 0.8))
-        
-        # Ajustar confiança baseada na diferença de scores
-        score_diff = abs(productive_score - nonproductive_score)
-        if score_diff > 0.5:
-            confidence = min(0.95, confidence + 0.1)
-        
+        classification = "Productive" if is_productive[i] else "Non-Productive"
+        results.append((classification, round(float(confidence[i]), 2), analysis_details))
+    
+    return results
+
+def score_linear_batch(features):
+    """Probabilidades do modelo linear para o lote (um produto esparso NumPy)"""
+    probabilities = linear_model.predict_proba(features)
+    
+    results = []
+    for feature, probability in zip(features, probabilities):
+        probability = float(probability)
+        analysis_details = feature.analysis_details()
         analysis_details.update({
-            'productive_score': round(productive_score, 3),
-            'nonproductive_score': round(nonproductive_score, 3),
-            'score_difference': round(score_diff, 3),
-            'method': 'lightweight_ai'
+            'productive_score': round(probability, 3),
+            'nonproductive_score': round(1.0 - probability, 3),
+            'score_difference': round(abs(2.0 * probability - 1.0), 3),
+            'method': 'linear_model'
         })
+        classification = "Productive" if probability > 0.5 else "Non-Productive"
+        results.append((classification, round(max(probability, 1.0 - probability), 2), analysis_details))
+    
+    return results
+
+def _classify_batch(texts, features, score_batch, method, with_sentiment):
+    """Completa as features e pontua o lote; erros por item caem no fallback de regras"""
+    results = [None] * len(texts)
+    scored_features = []
+    positions = []
+    
+    for i, text in enumerate(texts):
+        try:
+            record = features[i] if features is not None else extract_features(text)
+            if not extract_lightweight_features(record, with_sentiment):
+                results[i] = ("Productive", 0.5, {'method': 'empty_text'})
+                continue
+        except Exception as e:
+            logger.error(f"{method} classification failed: {e}")
+            app_metrics.inc('errors_total', method=method)
+            results[i] = classify_with_rules(text)
+            continue
         
-        return classification, round(confidence, 2), analysis_details
+        scored_features.append(record)
+        positions.append(i)
+    
+    if scored_features:
+        try:
+            with app_metrics.stage('scoring'):
+                scored = score_batch(scored_features)
+        except Exception as e:
+            logger.error(f"{method} batch scoring failed: {e}")
+            app_metrics.inc('errors_total', method=method)
+            scored = [classify_with_rules(texts[i]) for i in positions]
         
-    except Exception as e:
-        logger.error(f"Lightweight AI classification failed: {e}")
-        return classify_with_rules(text)
+        for i, result in zip(positions, scored):
+            results[i] = result
+    
+    return results
+
+def classify_batch_with_lightweight_ai(texts, features=None):
+    """Classificação leve de vários emails (sentimento + regras, score vetorizado)"""
+    return _classify_batch(texts, features, score_lightweight_batch, 'lightweight_ai', True)
+
+def classify_with_lightweight_ai(text):
+    """Classificação leve usando análise de sentimento + regras avançadas"""
+    return classify_batch_with_lightweight_ai([text])[0]
+
+def classify_batch_with_linear_model(texts, features=None):
+    """Classificação com o modelo linear treinado; sem sentimento, mesmos detalhes"""
+    return _classify_batch(texts, features, score_linear_batch, 'linear_model', False)
+
+def classify_batch(texts, features=None):
+    """Classifica com o motor configurado em CLASSIFIER_ENGINE"""
+    if CLASSIFIER_ENGINE == 'linear':
+        return classify_batch_with_linear_model(texts, features)
+    if CLASSIFIER_ENGINE == 'rules':
+        return [classify_with_rules(text) for text in texts]
+    return classify_batch_with_lightweight_ai(texts, features)
+
+# Palavras-chave do fallback de regras (montadas uma vez, não a cada chamada)
+RULES_PRODUCTIVE_KEYWORDS = frozenset({
+    'urgent', 'help', 'support', 'issue', 'problem', 'error', 'bug',
+    'question', 'assistance', 'request', 'deadline', 'fix', 'repair',
+    'technical', 'account', 'access', 'login', 'payment'
+})
+
+RULES_NONPRODUCTIVE_KEYWORDS = frozenset({
+    'thank', 'thanks', 'appreciate', 'congratulations', 'birthday',
+    'holiday', 'greeting', 'celebrate', 'party', 'social', 'welcome'
+})
 
 def classify_with_rules(text):
     """Classificação de fallback baseada em regras simples"""
     try:
-        productive_keywords = {
-            'urgent', 'help', 'support', 'issue', 'problem', 'error', 'bug',
-            'question', 'assistance', 'request', 'deadline', 'fix', 'repair',
-            'technical', 'account', 'access', 'login', 'payment'
-        }
-        
-        nonproductive_keywords = {
-            'thank', 'thanks', 'appreciate', 'congratulations', 'birthday',
-            'holiday', 'greeting', 'celebrate', 'party', 'social', 'welcome'
-        }
-        
         text_lower = text.lower()
         words = set(text_lower.split())
         
-        productive_score = len(words.intersection(productive_keywords))
-        nonproductive_score = len(words.intersection(nonproductive_keywords))
+        productive_score = len(words.intersection(RULES_PRODUCTIVE_KEYWORDS))
+        nonproductive_score = len(words.intersection(RULES_NONPRODUCTIVE_KEYWORDS))
         
         word_count = len(text.split())
         question_count = text.count('?')
@@ -285,71 +633,335 @@ def classify_with_rules(text):
             
     except Exception as e:
         logger.error(f"Rule-based classification failed: {e}")
+        app_metrics.inc('errors_total', method='rules')
         return "Productive", 0.5, {'method': 'fallback'}
 
-def generate_response(classification, confidence, original_text):
+# Modelos de resposta automática
+URGENT_RESPONSES = (
+    "Thank you for contacting us. We have received your request and understand its importance. Our technical team will review your issue and provide a detailed response within 24 hours.",
+    "We appreciate you reaching out regarding this matter. Your inquiry has been assigned high priority and forwarded to our specialized support team. You can expect a comprehensive response within one business day.",
+    "Thank you for bringing this to our attention. We recognize the urgency of your request and have escalated it to our senior technical staff. A team member will contact you shortly with a resolution."
+)
+
+PRODUCTIVE_RESPONSES = (
+    "Thank you for your email. We have received your message and will review it accordingly. Our team will get back to you within 48 hours.",
+    "We appreciate your inquiry. Your message has been logged in our system and will be addressed by our support team within 2 business days.",
+    "Thank you for contacting us. We have recorded your request and will ensure it receives appropriate attention from our team."
+)
+
+NONPRODUCTIVE_RESPONSES = (
+    "Thank you for your thoughtful message. We truly appreciate you taking the time to reach out and share your thoughts with us.",
+    "We're grateful for your kind words and appreciate your continued engagement with our services. Thank you for being part of our community.",
+    "Thank you for your email. It's always wonderful to hear from our valued clients, and we appreciate your ongoing relationship with us."
+)
+
+def generate_response(classification, confidence, original_text, digest=None):
     """Gera resposta automática contextual"""
     
     if classification == "Productive":
-        if confidence > 0.8:
-            responses = [
-                "Thank you for contacting us. We have received your request and understand its importance. Our technical team will review your issue and provide a detailed response within 24 hours.",
-                "We appreciate you reaching out regarding this matter. Your inquiry has been assigned high priority and forwarded to our specialized support team. You can expect a comprehensive response within one business day.",
-                "Thank you for bringing this to our attention. We recognize the urgency of your request and have escalated it to our senior technical staff. A team member will contact you shortly with a resolution."
-            ]
-        else:
-            responses = [
-                "Thank you for your email. We have received your message and will review it accordingly. Our team will get back to you within 48 hours.",
-                "We appreciate your inquiry. Your message has been logged in our system and will be addressed by our support team within 2 business days.",
-                "Thank you for contacting us. We have recorded your request and will ensure it receives appropriate attention from our team."
-            ]
+        responses = URGENT_RESPONSES if confidence > 0.8 else PRODUCTIVE_RESPONSES
     else:
-        responses = [
-            "Thank you for your thoughtful message. We truly appreciate you taking the time to reach out and share your thoughts with us.",
-            "We're grateful for your kind words and appreciate your continued engagement with our services. Thank you for being part of our community.",
-            "Thank you for your email. It's always wonderful to hear from our valued clients, and we appreciate your ongoing relationship with us."
-        ]
+        responses = NONPRODUCTIVE_RESPONSES
     
-    # Selecionar resposta baseada no hash do texto para consistência
-    response_index = hash(original_text) % len(responses)
+    # Selecionar resposta pelo digest estável do texto (hash() muda entre processos)
+    if digest is None:
+        digest = text_digest(original_text)
+    response_index = int(digest[:8], 16) % len(responses)
     return responses[response_index]
 
+def find_near_duplicates(misses, records, results):
+    """Preenche results com a classificação de emails quase idênticos já vistos;
+    retorna os fingerprints calculados (para indexar os que forem classificados)"""
+    fingerprints = {}
+    with app_metrics.stage('near_duplicate'):
+        for i in misses:
+            # Textos curtos têm fingerprints pouco confiáveis
+            if records[i].processed_words < near_duplicate_index.min_words:
+                continue
+            fingerprints[i] = simhash(records[i].processed_text)
+            match = near_duplicate_index.lookup(fingerprints[i])
+            app_metrics.inc('near_duplicate_lookups_total', result='miss' if match is None else 'hit')
+            if match is None:
+                continue
+            
+            (classification, confidence, matched_method), distance = match
+            results[i] = {
+                'classification': classification,
+                'confidence': confidence,
+                'analysis_details': {
+                    'method': 'near_duplicate',
+                    'matched_method': matched_method,
+                    'hamming_distance': distance,
+                    'similarity': round(1.0 - distance / 64.0, 3)
+                },
+                'near_duplicate': True
+            }
+    return fingerprints
+
+def analyze_texts(texts, features=None):
+    """Classifica e gera respostas para vários textos, reaproveitando o cache de
+    resultados e a classificação de quase-duplicatas"""
+    digests = [text_digest(text) for text in texts]
+    keys = [f"{RESULT_CACHE_NAMESPACE}:{digest}" for digest in digests]
+    results = [result_cache.get(key) for key in keys]
+    
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        records = {i: features[i] if features is not None else extract_features(texts[i]) for i in misses}
+        fingerprints = find_near_duplicates(misses, records, results) if near_duplicate_index.enabled else {}
+        
+        pending = [i for i in misses if results[i] is None]
+        if pending:
+            classified = classify_batch([texts[i] for i in pending], [records[i] for i in pending])
+            for i, (classification, confidence, analysis_details) in zip(pending, classified):
+                results[i] = {
+                    'classification': classification,
+                    'confidence': confidence,
+                    'analysis_details': analysis_details,
+                    'near_duplicate': False
+                }
+                if i in fingerprints and analysis_details.get('method') not in ('empty_text', 'fallback'):
+                    near_duplicate_index.add(fingerprints[i], (classification, confidence, analysis_details['method']))
+        
+        for i in misses:
+            with app_metrics.stage('response_generation'):
+                results[i]['suggested_response'] = generate_response(
+                    results[i]['classification'], results[i]['confidence'], texts[i], digests[i]
+                )
+            result_cache.set(keys[i], results[i])
+    
+    missed = set(misses)
+    for i, result in enumerate(results):
+        result['cache_hit'] = i not in missed
+        result.setdefault('near_duplicate', False)
+        app_metrics.inc('requests_total', method=result['analysis_details'].get('method', 'unknown'))
+    return results
+
+def requested_fields():
+    return parse_fields(request.values.get('fields'))
+
+def api_response(data, status=200, fields=True):
+    """Serializa a resposta no formato pedido (Accept: JSON ou MessagePack),
+    mantendo só os campos de ?fields= quando informado (fields=False quando a
+    view já projetou os itens)"""
+    if fields:
+        data = project(data, requested_fields())
+    mimetype = negotiate(request.accept_mimetypes)
+    with app_metrics.stage('serialization'):
+        body, mimetype = encode(data, mimetype)
+    return Response(body, status=status, mimetype=mimetype)
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/msgpack', 'application/x-msgpack')
+
+@app.after_request
+def compress_response(response):
+    """Gzip para respostas grandes já montadas em memória (streams NDJSON ficam de fora)"""
+    if (RESPONSE_GZIP_MIN_BYTES <= 0
+            or response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.accept_encodings):
+        return response
+
+    body = response.get_data()
+    if len(body) < RESPONSE_GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip_body(body, RESPONSE_GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def service_unavailable(message, retry_after):
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
+def admission_controlled(cost_class_of):
+    """Limita a concorrência da view pela classe de custo e aplica o prazo da requisição"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.deadline = Deadline(REQUEST_DEADLINE_SECONDS)
+            cost_class = cost_class_of()
+            try:
+                with admission.admit(cost_class, g.deadline):
+                    return view(*args, **kwargs)
+            except Overloaded as e:
+                logger.warning(str(e))
+                app_metrics.inc('admission_rejections_total', cost_class=e.cost_class, reason=e.reason)
+                return service_unavailable(str(e), e.retry_after)
+            except DeadlineExceeded as e:
+                logger.warning(str(e))
+                admission.record_deadline_exceeded()
+                app_metrics.inc('admission_rejections_total', cost_class=cost_class, reason='deadline')
+                return service_unavailable(str(e), ADMISSION_RETRY_AFTER)
+        return wrapper
+    return decorator
+
+def profiled(view):
+    """Grava um trace cProfile da view quando a requisição é escolhida pelo
+    profiler; com o profiling desligado a view é registrada sem wrapper"""
+    if not request_profiler.enabled:
+        return view
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        capture = request_profiler.start(request.headers.get('X-Profile-Token'))
+        if capture is None:
+            return view(*args, **kwargs)
+
+        status = 500
+        try:
+            response = view(*args, **kwargs)
+            status = make_response(response).status_code
+            return response
+        finally:
+            trace_id = request_profiler.stop(
+                capture,
+                path=request.path,
+                input_bytes=request.content_length or 0,
+                content_type=request.mimetype,
+                status=status
+            )
+            if trace_id:
+                logger.info(f"Profile trace {trace_id} written ({capture.reason})")
+    return wrapper
+
+def analyze_cost_class():
+    """Uploads de PDF usam a classe cara; texto direto e .txt, a barata"""
+    file = request.files.get('file')
+    if file and file.filename and file.filename.lower().endswith('.pdf'):
+        return 'pdf'
+    return 'text'
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint com status detalhado"""
     models_status = {
         'textblob_available': classifier.textblob_available,
-        'classification_method': 'lightweight_ai',
+        'sentiment_engine': classifier.sentiment_engine,
+        'classification_method': CLASSIFIER_ENGINE,
         'productive_keywords': len(classifier.productive_keywords),
         'nonproductive_keywords': len(classifier.nonproductive_keywords),
         'patterns_count': len(classifier.productive_patterns)
     }
+    if linear_model is not None:
+        models_status['linear_model'] = linear_model.info()
     
     response = jsonify({
         'status': 'healthy',
         'service': 'Lightweight Email Classifier API',
         'version': '3.0.0',
         'ai_models': models_status,
+        'result_cache': result_cache.stats(),
+        'jobs': job_manager.stats(),
+        'near_duplicate_index': near_duplicate_index.stats(),
+        'admission': admission.stats(),
+        'profiling': request_profiler.stats(),
+        'serving': app.config.get('SERVING_STATS', lambda: {'mode': 'wsgi'})(),
         'features': [
             'Lightweight text classification',
-            'TextBlob sentiment analysis',
+            'Lexicon sentiment analysis (TextBlob optional)',
             'Pattern-based recognition',
             'Rule-based classification',
-            'Fast and memory-efficient'
+            'Per-stage latency metrics (/api/metrics)',
+            'Streaming mailbox import (.mbox / .zip of .eml)',
+            'Async analysis jobs (/api/jobs/<id>)',
+            'Near-duplicate reuse for templated emails (SimHash)'
         ]
     })
-    
-    # Headers CORS manuais para garantir compatibilidade
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
+def build_analysis_response(email_text):
+    """Classifica o texto (já normalizado) e monta a resposta completa de /api/analyze"""
+    # Features calculadas uma vez e reutilizadas pelo classificador e pela resposta
+    features = extract_features(email_text)
+    
+    # Classificação leve com sentimento + regras e resposta automática (com cache)
+    result = analyze_texts([email_text], [features])[0]
+    classification = result['classification']
+    confidence = result['confidence']
+    analysis_details = result['analysis_details']
+    suggested_response = result['suggested_response']
+    logger.info(f"Classification: {classification}, Confidence: {confidence}, "
+                f"Cache hit: {result['cache_hit']}, Near duplicate: {result['near_duplicate']}")
+    
+    processed_text = features.processed_text
+    
+    return {
+        'classification': classification,
+        'confidence': confidence,
+        'suggested_response': suggested_response,
+        'original_text': email_text[:300] + "..." if len(email_text) > 300 else email_text,
+        'processed_text': processed_text[:200] + "..." if len(processed_text) > 200 else processed_text,
+        'ai_method': 'lightweight_hybrid',
+        'cache_hit': result['cache_hit'],
+        'near_duplicate': result['near_duplicate'],
+        'analysis_details': analysis_details,
+        'analysis': {
+            'text_length': features.text_length,
+            'word_count': features.word_count,
+            'processed_words': features.processed_words,
+            'question_marks': features.question_count,
+            'exclamation_marks': features.exclamation_count,
+            'memory_efficient': True
+        },
+        'model_info': {
+            'textblob_available': classifier.textblob_available,
+            'sentiment_engine': classifier.sentiment_engine,
+            'classification_method': MODEL_INFO_METHODS[CLASSIFIER_ENGINE],
+            'lightweight_version': '3.0.0'
+        }
+    }
+
+def process_analysis_job(kind, payload):
+    """Executado no pool de jobs: extrai o texto (PDF) e classifica"""
+    if kind == 'pdf':
+        with app_metrics.stage('pdf_extraction'):
+            email_text = extract_text_from_pdf(io.BytesIO(payload))
+    else:
+        email_text = payload
+    
+    if not email_text or len(email_text.strip()) < 10:
+        raise JobInputError('Please provide email content with at least 10 characters.')
+    return build_analysis_response(email_text.strip())
+
+def wants_async():
+    """Cliente aceita resposta assíncrona (async=true ou Prefer: respond-async)"""
+    flag = request.args.get('async') or request.form.get('async') or ''
+    return flag.lower() in ('1', 'true', 'yes') or 'respond-async' in request.headers.get('Prefer', '')
+
+def submit_analysis_job(kind, payload):
+    """Agenda a análise no pool e responde 202 com o endereço para polling"""
+    try:
+        job_id = job_manager.submit(process_analysis_job, kind, payload)
+    except JobQueueFull as e:
+        app_metrics.inc('jobs_total', outcome='rejected')
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    app_metrics.inc('jobs_total', outcome='submitted')
+    logger.info(f"Analysis job {job_id} submitted ({kind})")
+    status_url = f'/api/jobs/{job_id}'
+    response = jsonify({'job_id': job_id, 'status': 'queued', 'status_url': status_url})
+    response.headers['Location'] = status_url
+    return response, 202
+
 @app.route('/api/analyze', methods=['POST'])
+@admission_controlled(analyze_cost_class)
+@profiled
 def analyze_email():
     """Endpoint principal para análise de emails com Transformers"""
     logger.info("Transformers email analysis request received")
     
+    app_metrics.observe('payload_bytes', request.content_length or 0)
+    started = time.perf_counter()
+    pdf_seconds = 0.0
+    run_async = job_manager.enabled and wants_async()
+    
     try:
         email_text = ""
         
@@ -365,68 +977,293 @@ def analyze_email():
                 logger.info(f"Processing file: {filename}")
                 
                 if filename.lower().endswith('.txt'):
-                    try:
-                        email_text = file.read().decode('utf-8')
-                    except UnicodeDecodeError:
-                        try:
-                            email_text = file.read().decode('latin1')
-                        except:
-                            email_text = file.read().decode('utf-8', errors='ignore')
-                        
+                    email_text = read_text_upload(file.stream)
+                    
                 elif filename.lower().endswith('.pdf'):
-                    email_text = extract_text_from_pdf(file.stream)
+                    # PDFs são a parte cara: no modo assíncrono a extração vai para o pool
+                    if run_async:
+                        return submit_analysis_job('pdf', file.read())
+                    # A extração não passa do tempo que resta no prazo da requisição
+                    remaining = g.deadline.remaining()
+                    timeout = PDF_TIMEOUT_SECONDS if remaining is None else min(PDF_TIMEOUT_SECONDS, remaining)
+                    with app_metrics.stage('pdf_extraction') as pdf_timer:
+                        email_text = extract_text_from_pdf(file.stream, timeout=timeout)
+                    pdf_seconds = pdf_timer.elapsed
+                    g.deadline.check('pdf_extraction')
             else:
                 return jsonify({'error': 'Invalid file format. Please upload .txt or .pdf files only.'}), 400
         
+        # Leitura do input, sem contar a extração do PDF (medida à parte)
+        app_metrics.observe('stage_seconds', time.perf_counter() - started - pdf_seconds, stage='input_parsing')
+        
         if not email_text or len(email_text.strip()) < 10:
             return jsonify({'error': 'Please provide email content with at least 10 characters.'}), 400
         
-        # Classificação leve com TextBlob + regras
-        classification, confidence, analysis_details = classify_with_lightweight_ai(email_text)
-        logger.info(f"Classification: {classification}, Confidence: {confidence}")
-        
-        # Gerar resposta automática
-        suggested_response = generate_response(classification, confidence, email_text)
+        # Texto normalizado: é o que vai para o classificador e para a chave do cache
+        email_text = email_text.strip()
         
-        # Preprocessar para mostrar na resposta
-        processed_text = preprocess_text(email_text)
+        # Textos curtos continuam síncronos mesmo quando o cliente aceita async
+        if run_async and len(email_text) >= JOB_ASYNC_MIN_BYTES:
+            return submit_analysis_job('text', email_text)
         
-        # Preparar resposta completa
-        response_data = {
-            'classification': classification,
-            'confidence': confidence,
-            'suggested_response': suggested_response,
-            'original_text': email_text[:300] + "..." if len(email_text) > 300 else email_text,
-            'processed_text': processed_text[:200] + "..." if len(processed_text) > 200 else processed_text,
-            'ai_method': 'lightweight_hybrid',
-            'analysis_details': analysis_details,
-            'analysis': {
-                'text_length': len(email_text),
-                'word_count': len(email_text.split()),
-                'processed_words': len(processed_text.split()) if processed_text else 0,
-                'question_marks': email_text.count('?'),
-                'exclamation_marks': email_text.count('!'),
-                'memory_efficient': True
-            },
-            'model_info': {
-                'textblob_available': classifier.textblob_available,
-                'classification_method': 'rule_based_with_sentiment',
-                'lightweight_version': '3.0.0'
-            }
-        }
+        g.deadline.check('input_parsing')
+        response_data = build_analysis_response(email_text)
         
         logger.info("Analysis completed successfully")
-        response = jsonify(response_data)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-        return response
+        return api_response(response_data)
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Error in email analysis: {error_msg}")
+        app_metrics.inc('errors_total', method='request')
         return jsonify({'error': f'Internal server error: {error_msg}'}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status e, quando concluído, o resultado de um job assíncrono"""
+    if not job_manager.enabled:
+        return jsonify({'error': 'Async jobs are disabled'}), 404
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancela um job na fila ou em execução (o resultado é descartado)"""
+    if not job_manager.enabled:
+        return jsonify({'error': 'Async jobs are disabled'}), 404
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    if job['status'] != 'cancelled':
+        return jsonify({'error': f"Job already {job['status']}", 'job': job}), 409
+    logger.info(f"Analysis job {job_id} cancelled")
+    return jsonify(job)
+
+def parse_batch_payload(raw_body, content_type):
+    """Lê o corpo do batch como array JSON ou JSONL; retorna [(id, texto, erro)]"""
+    body = raw_body.decode('utf-8', errors='replace')
+    
+    if 'ndjson' in content_type or 'jsonl' in content_type or not body.lstrip().startswith('['):
+        entries = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                entries.append(ValueError('Invalid JSON line'))
+    else:
+        try:
+            entries = json.loads(body)
+        except ValueError:
+            raise ValueError('Invalid JSON array')
+    
+    items = []
+    for entry in entries:
+        if isinstance(entry, Exception):
+            items.append((None, None, str(entry)))
+            continue
+        
+        item_id = None
+        if isinstance(entry, dict):
+            item_id = entry.get('id')
+            entry = entry.get('text')
+        
+        if not isinstance(entry, str) or len(entry.strip()) < 10:
+            items.append((item_id, None, 'Please provide email content with at least 10 characters.'))
+        else:
+            items.append((item_id, entry.strip(), None))
+    
+    return items
+
+@app.route('/api/analyze/batch', methods=['POST'])
+@admission_controlled(lambda: 'pdf')
+def analyze_batch():
+    """Análise de vários emails (array JSON ou JSONL) com score vetorizado"""
+    logger.info("Batch email analysis request received")
+    app_metrics.observe('payload_bytes', request.content_length or 0)
+    
+    try:
+        items = parse_batch_payload(request.get_data(cache=False), request.content_type or '')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not items:
+        return jsonify({'error': 'Please provide at least one email.'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Too many emails in batch. Maximum is {MAX_BATCH_SIZE}.'}), 413
+    
+    g.deadline.check('input_parsing')
+    valid = [i for i, (_, text, _) in enumerate(items) if text is not None]
+    analyzed_by_index = dict(zip(valid, analyze_texts([items[i][1] for i in valid])))
+    
+    # ?fields= vale para cada item; index, id e error são sempre mantidos
+    fields = requested_fields()
+    results = []
+    errors = 0
+    for index, (item_id, _, error) in enumerate(items):
+        result = {'index': index}
+        if item_id is not None:
+            result['id'] = item_id
+        
+        if error is None:
+            result.update(project(analyzed_by_index[index], fields))
+        else:
+            result['error'] = error
+            errors += 1
+        results.append(result)
+    
+    logger.info(f"Batch analysis completed: {len(results)} emails, {errors} errors")
+    return api_response({
+        'results': results,
+        'count': len(results),
+        'errors': errors,
+        'ai_method': 'lightweight_hybrid'
+    }, fields=False)
+
+def classify_mailbox_batch(pending):
+    """Classifica um lote de mensagens do arquivo e gera as linhas NDJSON em ordem"""
+    rows = []
+    texts = []
+    for index, source, data, truncated in pending:
+        row = {'index': index, 'source': source}
+        if truncated:
+            row['truncated'] = True
+        try:
+            headers, text = parse_message(data)
+            row.update(headers)
+        except Exception as e:
+            row['error'] = f'Could not parse message: {e}'
+            text = ''
+        else:
+            text = text.strip()
+            if len(text) < 10:
+                row['error'] = 'Message has less than 10 characters of text content.'
+        rows.append(row)
+        texts.append(None if 'error' in row else text)
+    
+    valid = [i for i, text in enumerate(texts) if text is not None]
+    for i, result in zip(valid, analyze_texts([texts[i] for i in valid])):
+        rows[i].update(result)
+    return rows
+
+@app.route('/api/analyze/mailbox', methods=['POST'])
+def analyze_mailbox():
+    """Classifica um arquivo .mbox ou .zip de .eml, devolvendo NDJSON conforme processa"""
+    request.max_content_length = MAILBOX_MAX_BYTES
+    
+    # Upload multipart (file=...) ou corpo bruto com Content-Type application/mbox / application/zip
+    if request.mimetype == 'multipart/form-data':
+        file = request.files.get('file')
+        extension = file.filename.rsplit('.', 1)[-1].lower() if file and file.filename and '.' in file.filename else ''
+        if extension not in MAILBOX_EXTENSIONS:
+            return jsonify({'error': 'Invalid file format. Please upload a .mbox or .zip (of .eml) file.'}), 400
+        # O Flask fecha os arquivos do request ao sair da view, antes do streaming:
+        # o stream é desligado do FileStorage e fechado pelo próprio gerador
+        stream, kind = file.stream, extension
+        file.stream = io.BytesIO()
+    elif request.mimetype in ('application/mbox', 'application/zip'):
+        stream, kind = io.BufferedReader(request.stream), request.mimetype.split('/')[1]
+    else:
+        return jsonify({'error': 'Send a .mbox or .zip file as multipart upload or raw application/mbox body.'}), 400
+    
+    # Sem admission_controlled: a vaga precisa durar até o fim do streaming, não
+    # só até a view retornar, e o prazo da requisição não se aplica ao stream
+    slot = admission.admit('mailbox')
+    try:
+        slot.__enter__()
+    except Overloaded as e:
+        stream.close()
+        logger.warning(str(e))
+        app_metrics.inc('admission_rejections_total', cost_class=e.cost_class, reason=e.reason)
+        return service_unavailable(str(e), e.retry_after)
+    
+    logger.info(f"Mailbox analysis request received ({kind})")
+    
+    def generate():
+        pending = []
+        total = errors = 0
+        try:
+            messages = iter_archive_messages(stream, kind, MAILBOX_MAX_MESSAGE_BYTES)
+            for index, (source, data, truncated) in enumerate(messages):
+                pending.append((index, source, data, truncated))
+                # Primeira mensagem sai sozinha para o cliente receber resultados logo
+                if len(pending) >= MAILBOX_BATCH_SIZE or index == 0:
+                    for row in classify_mailbox_batch(pending):
+                        total += 1
+                        errors += 'error' in row
+                        yield json.dumps(row) + '\n'
+                    pending = []
+            if pending:
+                for row in classify_mailbox_batch(pending):
+                    total += 1
+                    errors += 'error' in row
+                    yield json.dumps(row) + '\n'
+        except (zipfile.BadZipFile, OSError) as e:
+            logger.error(f"Error reading mailbox archive: {e}")
+            yield json.dumps({'error': f'Could not read archive: {e}'}) + '\n'
+        except RequestEntityTooLarge:
+            # Corpo chunked que passou do limite no meio do streaming
+            logger.error("Mailbox archive exceeded the size limit")
+            yield json.dumps({'error': too_large_message()}) + '\n'
+        finally:
+            stream.close()
+        
+        logger.info(f"Mailbox analysis completed: {total} messages, {errors} errors")
+        yield json.dumps({'summary': {'messages': total, 'errors': errors}}) + '\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    # Liberada quando o servidor fecha a resposta, mesmo se o gerador nem começou
+    response.call_on_close(lambda: slot.__exit__(None, None, None))
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas no formato texto do Prometheus"""
+    response = make_response(app_metrics.render())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+def profiles_access_error():
+    # O índice e os traces expõem caminhos do código e tamanhos de entrada: só
+    # existem com PROFILE_TOKEN configurado (só com amostragem, os traces ficam
+    # apenas no disco)
+    if not request_profiler.enabled or not request_profiler.token:
+        return jsonify({'error': 'Endpoint not found'}), 404
+    if not request_profiler.authorized(request.headers.get('X-Profile-Token')):
+        return jsonify({'error': 'Invalid or missing X-Profile-Token'}), 403
+    return None
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """Traces gravados (mais recentes primeiro), com duração e tamanho da entrada"""
+    error = profiles_access_error()
+    if error is not None:
+        return error
+    traces = request_profiler.index()
+    if request.args.get('sort') == 'slowest':
+        traces.sort(key=lambda trace: trace['duration_ms'], reverse=True)
+    return jsonify({'profiler': request_profiler.stats(), 'traces': traces})
+
+@app.route('/api/profiles/<trace_id>', methods=['GET'])
+def get_profile(trace_id):
+    """Pilhas colapsadas (flamegraph.pl, speedscope) ou ?format=pstats (snakeviz)"""
+    error = profiles_access_error()
+    if error is not None:
+        return error
+    pstats_format = request.args.get('format') == 'pstats'
+    path = request_profiler.trace_path(trace_id, PSTATS_SUFFIX if pstats_format else TRACE_SUFFIX)
+    if path is None:
+        return jsonify({'error': 'Trace not found or rotated out'}), 404
+    if pstats_format:
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=trace_id + PSTATS_SUFFIX)
+    return send_file(path, mimetype='text/plain')
+
 @app.route('/api/examples', methods=['GET'])
 def get_examples():
     """Retorna exemplos de emails para demonstração"""
@@ -444,9 +1281,15 @@ def get_examples():
     }
     return jsonify(examples)
 
+def too_large_message():
+    """Mensagem com o limite aplicado à rota (a importação de mailbox tem o seu)"""
+    limit = request.max_content_length or app.config['MAX_CONTENT_LENGTH']
+    size = f'{limit // (1024 * 1024)}MB' if limit >= 1024 * 1024 else f'{limit // 1024}KB'
+    return f'File too large. Maximum size is {size}.'
+
 @app.errorhandler(413)
 def too_large(e):
-    return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
+    return jsonify({'error': too_large_message()}), 413
 
 @app.errorhandler(404)
 def not_found(e):
@@ -457,13 +1300,35 @@ def internal_error(e):
     logger.error(f"Internal server error: {e}")
     return jsonify({'error': 'Internal server error'}), 500
 
+# Textos de exemplo do aquecimento (um de cada classe)
+WARMUP_TEXTS = (
+    "Hello, I cannot access my account since yesterday. The login page shows error 500 "
+    "and I need this fixed urgently. Can you help?",
+    "Thank you so much for the lovely birthday wishes! Hope you are well and have a great holiday."
+)
+
+def warm_up():
+    """Carrega as dependências preguiçosas e exercita o caminho de classificação
+    sem tocar no cache, no índice de quase-duplicatas nem nas métricas"""
+    started = time.perf_counter()
+    import PyPDF2  # noqa: F401 (carregado aqui para ser compartilhado após o fork)
+    
+    texts = list(WARMUP_TEXTS)
+    classify_batch(texts, [_extract_features(text) for text in texts])
+    simhash(preprocess_text(texts[0]))
+    app_metrics.reset()
+    logger.info(f"Warm-up completed in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+if STARTUP_WARMUP:
+    warm_up()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
     
     logger.info(f"Starting Lightweight Email Classifier Flask app on port {port}")
     logger.info(f"Debug mode: {debug}")
-    logger.info(f"TextBlob available: {classifier.textblob_available}")
+    logger.info(f"Sentiment engine: {classifier.sentiment_engine}")
     logger.info(f"Classification method: Lightweight AI + Rules")
     logger.info(f"Memory usage: Minimal (< 50MB)")
     
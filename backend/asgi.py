@@ -0,0 +1,234 @@
+"""Modo de serviço ASGI: /api/analyze, /api/health e /api/examples.
+
+O corpo da requisição é recebido no event loop (um upload lento custa só uma
+corrotina, não uma thread do worker) e, com o corpo completo, a view Flask
+correspondente roda num pool limitado de threads, onde ficam as etapas de CPU
+(extração de PDF, sentimento, score). Admissão, prazos e métricas continuam os
+mesmos do app Flask.
+
+Uso (a partir de backend/, com uvicorn instalado):
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker --preload asgi:application
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app as flask_app, ADMISSION_RETRY_AFTER
+
+logger = logging.getLogger(__name__)
+
+ASGI_ROUTES = frozenset({'/api/analyze', '/api/health', '/api/examples'})
+
+# Threads que executam as views (etapas de CPU); requisições com o corpo já
+# recebido esperam por uma thread até o limite ASGI_MAX_PENDING
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+ASGI_MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', 256))
+# Total de bytes de corpos em recepção ou na fila do pool, somando as conexões
+ASGI_MAX_BUFFERED_MB = float(os.environ.get('ASGI_MAX_BUFFERED_MB', 256))
+
+MAX_BODY_BYTES = flask_app.config['MAX_CONTENT_LENGTH']
+
+# Estado do processo: o pool é criado no primeiro uso de cada worker (não é
+# herdado do master com --preload) e os contadores só mudam no event loop
+class _Bridge:
+    def __init__(self, threads, max_pending, max_buffered_bytes):
+        self.threads = threads
+        self.max_pending = max_pending
+        self.max_buffered_bytes = max_buffered_bytes
+        self.buffered_bytes = 0
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+        self._executor_pid = None
+
+    def pool(self):
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='asgi-view')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def stats(self):
+        return {
+            'threads': self.threads,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'buffered_bytes': self.buffered_bytes,
+            'max_buffered_bytes': self.max_buffered_bytes,
+            'rejected': self.rejected
+        }
+
+bridge = _Bridge(ASGI_THREADS, ASGI_MAX_PENDING, int(ASGI_MAX_BUFFERED_MB * 1024 * 1024))
+flask_app.config['SERVING_STATS'] = lambda: {'mode': 'asgi', **bridge.stats()}
+
+# Corpo recusado antes de chegar à view
+class _BodyRejected(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+def build_environ(scope, body):
+    """Environ WSGI (PEP 3333) a partir do scope ASGI e do corpo já recebido"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+def call_flask(environ):
+    """Roda no pool: executa a view e devolve (status, headers, corpo)"""
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured['status'] = int(status.split(' ', 1)[0])
+        captured['headers'] = headers
+
+    iterable = flask_app.wsgi_app(environ, start_response)
+    try:
+        # As rotas expostas não fazem streaming: a resposta cabe em memória
+        body = b''.join(iterable)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    return captured['status'], captured['headers'], body
+
+async def send_response(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_error(send, status, message, retry_after=None):
+    body = json.dumps({'error': message}, separators=(',', ':')).encode('utf-8')
+    headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))]
+    if retry_after is not None:
+        headers.append(('Retry-After', str(retry_after)))
+    await send_response(send, status, headers, body)
+
+async def receive_body(scope, receive):
+    """Lê o corpo pelo event loop, respeitando o limite por requisição e o total
+    em memória do processo. Retorna (corpo, bytes reservados)"""
+    declared = None
+    for name, value in scope['headers']:
+        if name == b'content-length':
+            try:
+                declared = int(value)
+            except ValueError:
+                raise _BodyRejected(400, 'Invalid Content-Length header.')
+    if declared is not None and declared > MAX_BODY_BYTES:
+        raise _BodyRejected(413, 'File too large. Maximum size is 16MB.')
+
+    body = bytearray()
+    reserved = 0
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise _BodyRejected(499, 'Client disconnected.')
+            chunk = message.get('body', b'')
+            if chunk:
+                if len(body) + len(chunk) > MAX_BODY_BYTES:
+                    raise _BodyRejected(413, 'File too large. Maximum size is 16MB.')
+                if bridge.buffered_bytes + len(chunk) > bridge.max_buffered_bytes:
+                    bridge.rejected += 1
+                    raise _BodyRejected(503, 'Server busy (request buffers full), try again later.',
+                                        ADMISSION_RETRY_AFTER)
+                bridge.buffered_bytes += len(chunk)
+                reserved += len(chunk)
+                body += chunk
+            if not message.get('more_body', False):
+                return bytes(body), reserved
+    except BaseException:
+        bridge.buffered_bytes -= reserved
+        raise
+
+async def handle_http(scope, receive, send):
+    if scope['path'] not in ASGI_ROUTES:
+        await send_error(send, 404, 'Endpoint not found')
+        return
+
+    try:
+        body, reserved = await receive_body(scope, receive)
+    except _BodyRejected as e:
+        if e.status == 503:
+            logger.warning(e.message)
+        if e.status != 499:
+            await send_error(send, e.status, e.message, e.retry_after)
+        return
+
+    try:
+        if bridge.pending >= bridge.max_pending:
+            bridge.rejected += 1
+            logger.warning("Server busy (view queue full)")
+            await send_error(send, 503, 'Server busy (view queue full), try again later.', ADMISSION_RETRY_AFTER)
+            return
+
+        bridge.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            status, headers, response_body = await loop.run_in_executor(
+                bridge.pool(), call_flask, build_environ(scope, body)
+            )
+        finally:
+            bridge.pending -= 1
+    finally:
+        bridge.buffered_bytes -= reserved
+
+    await send_response(send, status, headers, response_body)
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            bridge.pool()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.get_running_loop().run_in_executor(None, bridge.shutdown)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        await handle_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
@@ -0,0 +1,8 @@
+"""Benchmarks reprodutíveis do classificador e da API.
+
+Uso (a partir de backend/):
+    python -m benchmarks run --output bench.json
+    python -m benchmarks compare baseline.json bench.json --threshold 0.15
+    python -m benchmarks startup --workers 2
+    python -m benchmarks serving --workers 2 --slow-clients 64
+"""
@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+
+from .runner import compare, load, run
+from .serving import run_serving
+from .startup import run_startup
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Email classifier benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run benchmarks and write JSON results')
+    run_parser.add_argument('--output', '-o', default='bench.json')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--size', type=int, default=20, help='emails per corpus category')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--no-api', action='store_true', help='skip /api/analyze end-to-end runs')
+
+    compare_parser = commands.add_parser('compare', help='fail when results regress against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15,
+                                help='allowed relative increase (0.15 = 15%%)')
+
+    startup_parser = commands.add_parser('startup', help='measure import time, first requests and per-worker memory')
+    startup_parser.add_argument('--workers', type=int, default=2)
+    startup_parser.add_argument('--repeat', type=int, default=3)
+    startup_parser.add_argument('--output', '-o', help='also write the results as JSON')
+
+    serving_parser = commands.add_parser('serving', help='load test gunicorn sync against the ASGI mode')
+    serving_parser.add_argument('--workers', type=int, default=2)
+    serving_parser.add_argument('--duration', type=float, default=10.0, help='seconds per scenario')
+    serving_parser.add_argument('--fast-clients', type=int, default=8)
+    serving_parser.add_argument('--slow-clients', type=int, default=64)
+    serving_parser.add_argument('--upload-seconds', type=float, default=4.0,
+                                help='time each slow client takes to send its body')
+    serving_parser.add_argument('--output', '-o', help='also write the results as JSON')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report = run(seed=args.seed, size=args.size, repeat=args.repeat, include_api=not args.no_api)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        for name, stats in sorted(report['benchmarks'].items()):
+            print(f"{name:45} p50={stats['p50_ms']:>10.3f}ms p99={stats['p99_ms']:>10.3f}ms "
+                  f"peak={stats['peak_memory_kb']:>9.1f}KB")
+        print(f"Results written to {args.output}")
+        return 0
+
+    if args.command == 'startup':
+        results = run_startup(workers=args.workers, repeat=args.repeat)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        for name, stats in results.items():
+            print(f"{name:16} import={stats['import_ms']:>8.1f}ms first_text={stats['worker_first_text_ms']:>7.1f}ms "
+                  f"first_pdf={stats['worker_first_pdf_ms']:>7.1f}ms worker_rss={stats['worker_rss_kb']}KB "
+                  f"worker_private={stats['worker_private_kb']}KB")
+        return 0
+
+    if args.command == 'serving':
+        results = run_serving(workers=args.workers, duration=args.duration, fast_clients=args.fast_clients,
+                              slow_clients=args.slow_clients, upload_seconds=args.upload_seconds)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        for name, scenarios in results.items():
+            if 'skipped' in scenarios:
+                print(f"{name:14} skipped: {scenarios['skipped']}")
+                continue
+            for scenario, stats in scenarios.items():
+                print(f"{name:14} {scenario:18} rps={stats['requests_per_s']:>8.1f} "
+                      f"p50={stats.get('p50_ms', 0):>9.1f}ms p99={stats.get('p99_ms', 0):>9.1f}ms "
+                      f"errors={stats['errors']} slow_completed={stats['slow_completed']}")
+        return 0
+
+    regressions = compare(load(args.baseline), load(args.current), args.threshold)
+    for name, metric, old, new, change in regressions:
+        print(f"REGRESSION {name} {metric}: {old} -> {new} (+{change:.0%})")
+    if regressions:
+        return 1
+    print("No regressions found")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
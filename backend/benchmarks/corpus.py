@@ -0,0 +1,85 @@
+import random
+
+# Vocabulário base para os emails sintéticos
+FILLER_WORDS = (
+    "the of and to in is you that it for on are as with they at be this from have "
+    "or one had by but not what all were we when your can there use an each which "
+    "do how their if will up other about out many then them these so some would make"
+).split()
+
+PRODUCTIVE_PHRASES = [
+    "I cannot access my account", "the login page shows an error", "please help asap",
+    "this is urgent", "error #4512 when exporting", "the payment failed", "can you fix this?",
+    "the deadline is friday", "our system is not working", "unable to reset the password"
+]
+
+NONPRODUCTIVE_PHRASES = [
+    "thank you so much", "happy birthday", "congratulations on the launch",
+    "best regards", "hope you are well", "wishing you a great holiday", "we appreciate it"
+]
+
+def _sentence(rng, phrases, words):
+    filler = ' '.join(rng.choice(FILLER_WORDS) for _ in range(words))
+    return f"{rng.choice(phrases).capitalize()} {filler}."
+
+def make_email(rng, words, productive=True):
+    """Gera um email sintético com aproximadamente `words` palavras"""
+    phrases = PRODUCTIVE_PHRASES if productive else NONPRODUCTIVE_PHRASES
+    sentences = []
+    total = 0
+    while total < words:
+        size = rng.randint(6, 18)
+        sentences.append(_sentence(rng, phrases, size))
+        total += size + 4
+    return "Hi team,\n\n" + ' '.join(sentences) + "\n\nBest,\nAlex"
+
+def make_pdf(pages):
+    """Monta um PDF mínimo (uma linha de texto por página) sem dependências externas"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>')
+    font_id = 3 + 2 * len(pages)
+
+    for i, text in enumerate(pages):
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            f'/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>'
+        )
+        escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        stream = f'BT /F1 12 Tf 72 720 Td ({escaped}) Tj ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+    objects.append('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    output = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+
+    xref = len(output)
+    output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    for offset in offsets:
+        output += f'{offset:010d} 00000 n \n'.encode()
+    output += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return output
+
+def generate_corpus(seed=42, size=20):
+    """Corpus determinístico: emails curtos, longos, PDFs e entradas patológicas"""
+    rng = random.Random(seed)
+    corpus = {
+        'short': [make_email(rng, rng.randint(15, 60), productive=i % 2 == 0) for i in range(size)],
+        'long': [make_email(rng, rng.randint(800, 2000), productive=i % 2 == 0) for i in range(size)],
+        'pathological': [
+            'A' * 200000,                                # uma única "palavra" gigante
+            '?' * 50000 + ' help',                       # só pontuação
+            ' '.join(['thanks'] * 50000),                # palavra-chave repetida
+            'ÉRROR ünïcödé ' * 20000,                    # texto não ASCII
+            'x\n' * 100000,                              # muitas linhas curtas
+            make_email(rng, 200000),                     # texto de ~1 MB
+        ],
+    }
+    corpus['pdf'] = [
+        make_pdf([make_email(rng, 120, productive=i % 2 == 0).replace('\n', ' ') for _ in range(pages)])
+        for i, pages in enumerate((1, 5, 40, 200))
+    ]
+    return corpus
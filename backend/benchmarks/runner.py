@@ -0,0 +1,147 @@
+import gc
+import io
+import json
+import platform
+import time
+import tracemalloc
+
+from .corpus import generate_corpus
+
+def summarize(timings, peak_bytes):
+    """Estatísticas de latência (ms) e memória de uma série de medições"""
+    timings = sorted(timings)
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(round(p / 100 * (len(timings) - 1))))] * 1000
+
+    total = sum(timings)
+    return {
+        'runs': len(timings),
+        'p50_ms': round(percentile(50), 4),
+        'p90_ms': round(percentile(90), 4),
+        'p99_ms': round(percentile(99), 4),
+        'mean_ms': round(total / len(timings) * 1000, 4),
+        'throughput_per_s': round(len(timings) / total, 2) if total else None,
+        'peak_memory_kb': round(peak_bytes / 1024, 1)
+    }
+
+def measure(func, inputs, repeat=3):
+    """Executa func(input) para cada entrada `repeat` vezes, medindo tempo e pico de memória"""
+    func(inputs[0])  # aquecimento
+    gc.collect()
+
+    timings = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            for item in inputs:
+                started = time.perf_counter()
+                func(item)
+                timings.append(time.perf_counter() - started)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # tracemalloc deixa as chamadas mais lentas: refaz o tempo sem ele
+    timings = []
+    for _ in range(repeat):
+        for item in inputs:
+            started = time.perf_counter()
+            func(item)
+            timings.append(time.perf_counter() - started)
+    return summarize(timings, peak)
+
+def run_micro(app_module, corpus, repeat):
+    results = {}
+    texts = {kind: corpus[kind] for kind in ('short', 'long', 'pathological')}
+
+    for kind, items in texts.items():
+        results[f'preprocess_text/{kind}'] = measure(app_module.preprocess_text, items, repeat)
+        results[f'classify_with_lightweight_ai/{kind}'] = measure(app_module.classify_with_lightweight_ai, items, repeat)
+        results[f'classify_with_rules/{kind}'] = measure(app_module.classify_with_rules, items, repeat)
+        if app_module.linear_model is not None:
+            results[f'classify_with_linear_model/{kind}'] = measure(
+                lambda text: app_module.classify_batch_with_linear_model([text]), items, repeat
+            )
+        results[f'generate_response/{kind}'] = measure(
+            lambda text: app_module.generate_response('Productive', 0.9, text), items, repeat
+        )
+
+    results['extract_text_from_pdf/pdf'] = measure(
+        lambda pdf: app_module.extract_text_from_pdf(io.BytesIO(pdf)), corpus['pdf'], repeat
+    )
+    return results
+
+def run_end_to_end(app_module, corpus, repeat):
+    """Latência e vazão de /api/analyze pelo test client do Flask (cache desativado)"""
+    client = app_module.app.test_client()
+    results = {}
+
+    def post_text(text):
+        response = client.post('/api/analyze', data={'text': text})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    def post_pdf(pdf):
+        response = client.post('/api/analyze', data={'file': (io.BytesIO(pdf), 'email.pdf')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    for kind in ('short', 'long', 'pathological'):
+        results[f'api_analyze/{kind}'] = measure(post_text, corpus[kind], repeat)
+    results['api_analyze/pdf'] = measure(post_pdf, corpus['pdf'], repeat)
+    return results
+
+def run(seed=42, size=20, repeat=3, include_api=True):
+    """Roda todos os benchmarks e retorna o relatório em formato JSON-serializável"""
+    import logging
+    logging.disable(logging.WARNING)
+    import app as app_module
+
+    # Medir o trabalho real, não o cache de resultados nem o índice de quase-duplicatas
+    saved_max_bytes = app_module.result_cache.max_bytes
+    saved_max_entries = app_module.near_duplicate_index.max_entries
+    app_module.result_cache.max_bytes = 0
+    app_module.near_duplicate_index.max_entries = 0
+    try:
+        corpus = generate_corpus(seed=seed, size=size)
+        benchmarks = run_micro(app_module, corpus, repeat)
+        if include_api:
+            benchmarks.update(run_end_to_end(app_module, corpus, repeat))
+    finally:
+        app_module.result_cache.max_bytes = saved_max_bytes
+        app_module.near_duplicate_index.max_entries = saved_max_entries
+        logging.disable(logging.NOTSET)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'corpus_size': size,
+            'repeat': repeat,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'benchmarks': benchmarks
+    }
+
+COMPARED_METRICS = ('p50_ms', 'p99_ms', 'peak_memory_kb')
+
+def compare(baseline, current, threshold=0.15):
+    """Lista regressões de p50/p99/memória acima do limite relativo"""
+    regressions = []
+    for name, before in baseline['benchmarks'].items():
+        after = current['benchmarks'].get(name)
+        if after is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,164 @@
+"""Teste de carga: gunicorn síncrono (app:app) contra o modo ASGI (asgi:application).
+
+Cada servidor sobe num subprocesso com o mesmo número de workers, sem cache de
+resultados e sem índice de quase-duplicatas. Clientes rápidos fazem POST em
+/api/analyze em laço enquanto clientes lentos enviam o corpo aos poucos (como
+uploads em conexões ruins); mede-se vazão e latência dos clientes rápidos com
+e sem os lentos. Precisa de gunicorn e uvicorn instalados.
+"""
+import asyncio
+import importlib.util
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+
+from .corpus import make_email
+from .runner import summarize
+
+SERVERS = {
+    'gunicorn_sync': {
+        'module': 'gunicorn',
+        'command': lambda port, workers: ['-m', 'gunicorn', '--workers', str(workers),
+                                          '--bind', f'127.0.0.1:{port}', 'app:app']
+    },
+    'asgi_uvicorn': {
+        'module': 'uvicorn',
+        'command': lambda port, workers: ['-m', 'uvicorn', 'asgi:application', '--workers', str(workers),
+                                          '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning']
+    }
+}
+
+SERVER_ENV = {
+    'RESULT_CACHE_MAX_MB': '0',
+    'NEAR_DUPLICATE_MAX_ENTRIES': '0',
+    'JOB_WORKERS': '0'
+}
+
+REQUEST_TIMEOUT = 30
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+async def post(port, body, chunks=1, upload_seconds=0.0):
+    """POST /api/analyze com o corpo enviado em `chunks` partes ao longo de
+    `upload_seconds`. Retorna o status HTTP (0 = falha de conexão ou timeout)"""
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), REQUEST_TIMEOUT)
+        writer.write(
+            f'POST /api/analyze HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+            f'Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'.encode('ascii')
+        )
+        step = max(1, -(-len(body) // chunks))
+        for start in range(0, len(body), step):
+            writer.write(body[start:start + step])
+            await writer.drain()
+            if chunks > 1:
+                await asyncio.sleep(upload_seconds / chunks)
+        status_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+        await asyncio.wait_for(reader.read(), REQUEST_TIMEOUT)
+        return int(status_line.split()[1])
+    except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+        return 0
+    finally:
+        if writer is not None:
+            writer.close()
+
+async def load(port, bodies, duration, fast_clients, slow_clients, upload_seconds):
+    deadline = time.monotonic() + duration
+    fast = {'timings': [], 'errors': 0}
+    slow = {'completed': 0, 'errors': 0}
+
+    async def fast_client(offset):
+        i = offset
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            status = await post(port, bodies[i % len(bodies)])
+            if status == 200:
+                fast['timings'].append(time.perf_counter() - started)
+            else:
+                fast['errors'] += 1
+            i += fast_clients
+
+    async def slow_client(offset):
+        # Início escalonado: os uploads não terminam todos no mesmo instante
+        await asyncio.sleep(offset / slow_clients * upload_seconds)
+        i = offset
+        while time.monotonic() < deadline:
+            status = await post(port, bodies[i % len(bodies)], chunks=20, upload_seconds=upload_seconds)
+            slow['completed' if status == 200 else 'errors'] += 1
+            i += 1
+
+    # Os lentos começam antes para já ocuparem as conexões quando a medição começa
+    slow_tasks = [asyncio.create_task(slow_client(i)) for i in range(slow_clients)]
+    await asyncio.sleep(upload_seconds if slow_clients else 0)
+    started = time.perf_counter()
+    await asyncio.gather(*(fast_client(i) for i in range(fast_clients)))
+    fast['elapsed'] = time.perf_counter() - started
+    await asyncio.gather(*slow_tasks)
+    return fast, slow
+
+def _wait_ready(port, process, timeout=30):
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1) as sock:
+                sock.sendall(b'GET /api/health HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+                if sock.recv(16).startswith(b'HTTP/1.1 200'):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('server did not become ready')
+
+def run_serving(workers=2, duration=10.0, fast_clients=8, slow_clients=64, upload_seconds=4.0, seed=42):
+    """Sobe cada servidor e mede os clientes rápidos sem e com clientes lentos"""
+    rng = random.Random(seed)
+    bodies = [
+        urllib.parse.urlencode({'text': make_email(rng, rng.randint(40, 200), productive=i % 2 == 0)}).encode('ascii')
+        for i in range(200)
+    ]
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, **SERVER_ENV}
+
+    results = {}
+    for name, server in SERVERS.items():
+        if importlib.util.find_spec(server['module']) is None:
+            results[name] = {'skipped': f"{server['module']} is not installed"}
+            continue
+
+        port = _free_port()
+        process = subprocess.Popen([sys.executable, *server['command'](port, workers)], cwd=backend, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_ready(port, process)
+            results[name] = {}
+            for scenario, slow in (('fast_only', 0), ('with_slow_clients', slow_clients)):
+                fast, slow_stats = asyncio.run(load(port, bodies, duration, fast_clients, slow, upload_seconds))
+                stats = summarize(fast['timings'], 0) if fast['timings'] else {}
+                stats.pop('peak_memory_kb', None)
+                stats.pop('throughput_per_s', None)
+                results[name][scenario] = {
+                    'requests_per_s': round(len(fast['timings']) / fast['elapsed'], 1),
+                    'errors': fast['errors'],
+                    **stats,
+                    'slow_clients': slow,
+                    'slow_completed': slow_stats['completed'],
+                    'slow_errors': slow_stats['errors']
+                }
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return results
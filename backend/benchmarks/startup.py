@@ -0,0 +1,115 @@
+"""Inicialização do app: tempo de importação, primeira requisição e memória por worker.
+
+Cada cenário roda em um interpretador novo, que importa o app como o master do
+gunicorn --preload e faz fork dos workers. Cada worker atende uma requisição de
+texto e uma de PDF e informa RSS, memória privada (USS) e compartilhada, lidas
+de /proc/self/smaps_rollup (Linux).
+"""
+import gc
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from .corpus import make_pdf
+
+SCENARIOS = {
+    'default': {'warmup': False, 'freeze': False},
+    'preload_warmup': {'warmup': True, 'freeze': True},
+}
+
+FIRST_TEXT = "Hello, my payment failed twice and I cannot access the invoice page. Can you check it?"
+
+def memory_kb():
+    """RSS, privada e compartilhada do processo atual, em KB"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup', encoding='ascii') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        import resource
+        return {'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return {
+        'rss_kb': fields.get('Rss', 0),
+        'private_kb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared_kb': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    }
+
+def _worker(app_module, pdf):
+    client = app_module.app.test_client()
+    started = time.perf_counter()
+    client.post('/api/analyze', data={'text': FIRST_TEXT})
+    first_text = time.perf_counter() - started
+
+    started = time.perf_counter()
+    client.post('/api/analyze', data={'file': (io.BytesIO(pdf), 'email.pdf')})
+    first_pdf = time.perf_counter() - started
+
+    gc.collect()
+    stats = memory_kb()
+    stats.update({'first_text_ms': round(first_text * 1000, 2), 'first_pdf_ms': round(first_pdf * 1000, 2)})
+    return stats
+
+def probe(workers, warmup, freeze):
+    """Executado no interpretador novo: importa o app, faz fork e mede os workers"""
+    os.environ['STARTUP_WARMUP'] = 'true' if warmup else 'false'
+    pdf = make_pdf(["Urgent: the system is down and we cannot log in. Please fix it today."])
+
+    import logging
+    logging.disable(logging.WARNING)
+    started = time.perf_counter()
+    import app as app_module
+    import_ms = (time.perf_counter() - started) * 1000
+    if freeze:
+        gc.freeze()
+
+    report = {'import_ms': round(import_ms, 2), 'master': memory_kb(), 'workers': []}
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            with os.fdopen(write_fd, 'w') as out:
+                json.dump(_worker(app_module, pdf), out)
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as result:
+            report['workers'].append(json.load(result))
+        os.waitpid(pid, 0)
+    return report
+
+def _median(values):
+    return round(statistics.median(values), 2) if values else None
+
+def run_startup(workers=2, repeat=3):
+    """Roda cada cenário `repeat` vezes em subprocessos e resume pela mediana"""
+    results = {}
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name, options in SCENARIOS.items():
+        runs = []
+        for _ in range(repeat):
+            command = [sys.executable, '-m', 'benchmarks.startup', str(workers),
+                       '1' if options['warmup'] else '0', '1' if options['freeze'] else '0']
+            output = subprocess.run(command, cwd=backend, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+        worker_stats = [worker for run in runs for worker in run['workers']]
+        results[name] = {
+            'import_ms': _median([run['import_ms'] for run in runs]),
+            'master_rss_kb': _median([run['master']['rss_kb'] for run in runs]),
+            **{
+                f'worker_{key}': _median([worker[key] for worker in worker_stats if key in worker])
+                for key in ('rss_kb', 'private_kb', 'shared_kb', 'first_text_ms', 'first_pdf_ms')
+            }
+        }
+    return results
+
+if __name__ == '__main__':
+    workers, warmup, freeze = int(sys.argv[1]), sys.argv[2] == '1', sys.argv[3] == '1'
+    print(json.dumps(probe(workers, warmup, freeze)))
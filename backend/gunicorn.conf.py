@@ -0,0 +1,25 @@
+# Configuração do gunicorn, lida automaticamente quando iniciado a partir de backend/.
+# Com --preload (ou GUNICORN_PRELOAD=true) o app é importado uma vez no master e os
+# workers herdam classificador, léxico e modelo por copy-on-write.
+import gc
+import os
+
+from dotenv import load_dotenv
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+
+def on_starting(server):
+    # Snapshots de métricas de execuções anteriores não entram na soma do
+    # /api/metrics (roda no master, antes de os workers serem criados)
+    load_dotenv()
+    metrics_dir = os.environ.get('METRICS_DIR', '')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        from metrics import clear_snapshots
+        removed = clear_snapshots(metrics_dir)
+        server.log.info(f"Removed {removed} stale metrics snapshots from {metrics_dir}")
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # Objetos do app saem do coletor de lixo: as coletas nos workers não
+        # escrevem nessas páginas, que continuam compartilhadas
+        gc.freeze()
@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from sqlite_store import SQLiteConnections
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# Jobs que o processo filho executa: erros de entrada viram status 'failed' com a mensagem
+class JobInputError(ValueError):
+    pass
+
+class JobQueueFull(RuntimeError):
+    pass
+
+# Store de jobs em SQLite: compartilhado entre os workers do gunicorn e os
+# processos do pool, então qualquer worker responde ao polling
+class JobStore:
+    def __init__(self, path):
+        self.path = path
+        self._db = SQLiteConnections(path)
+        self._writes = 0
+
+        conn = self._db.connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL, '
+            'updated_at REAL NOT NULL, expires_at REAL NOT NULL, result BLOB, error TEXT)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at)')
+        conn.commit()
+
+    def create(self, ttl):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._db.connection()
+        conn.execute(
+            'INSERT INTO jobs (id, status, created_at, updated_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, QUEUED, now, now, now + ttl)
+        )
+        conn.commit()
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+        return job_id
+
+    def _transition(self, job_id, from_states, status, result=None, error=None):
+        """Muda o status só a partir dos estados indicados; retorna True se mudou"""
+        conn = self._db.connection()
+        placeholders = ','.join('?' * len(from_states))
+        changed = conn.execute(
+            f'UPDATE jobs SET status = ?, updated_at = ?, result = ?, error = ? '
+            f'WHERE id = ? AND status IN ({placeholders})',
+            (status, time.time(), result, error, job_id, *from_states)
+        ).rowcount
+        conn.commit()
+        return changed > 0
+
+    def claim(self, job_id):
+        return self._transition(job_id, (QUEUED,), RUNNING)
+
+    def finish(self, job_id, result):
+        payload = json.dumps(result, separators=(',', ':')).encode('utf-8')
+        return self._transition(job_id, (RUNNING,), DONE, result=payload)
+
+    def fail(self, job_id, error):
+        return self._transition(job_id, (QUEUED, RUNNING), FAILED, error=error)
+
+    def cancel(self, job_id):
+        return self._transition(job_id, (QUEUED, RUNNING), CANCELLED)
+
+    def get(self, job_id):
+        row = self._db.connection().execute(
+            'SELECT status, created_at, updated_at, expires_at, result, error '
+            'FROM jobs WHERE id = ? AND expires_at > ?',
+            (job_id, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+
+        status, created_at, updated_at, expires_at, result, error = row
+        job = {
+            'job_id': job_id,
+            'status': status,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'expires_at': expires_at
+        }
+        if result is not None:
+            job['result'] = json.loads(result)
+        if error is not None:
+            job['error'] = error
+        return job
+
+    def prune(self):
+        conn = self._db.connection()
+        removed = conn.execute('DELETE FROM jobs WHERE expires_at <= ?', (time.time(),)).rowcount
+        conn.commit()
+        return removed
+
+    def counts(self):
+        rows = self._db.connection().execute(
+            'SELECT status, COUNT(*) FROM jobs WHERE expires_at > ? GROUP BY status', (time.time(),)
+        ).fetchall()
+        return dict(rows)
+
+_stores = {}
+
+def run_job(store_path, job_id, fn, args):
+    """Executa no processo do pool: reserva o job, roda fn(*args) e grava o resultado"""
+    store = _stores.get(store_path)
+    if store is None:
+        store = _stores[store_path] = JobStore(store_path)
+
+    # Cancelado (ou expirado) enquanto esperava na fila
+    if not store.claim(job_id):
+        return
+    try:
+        result = fn(*args)
+    except JobInputError as e:
+        store.fail(job_id, str(e))
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        store.fail(job_id, f'Internal error: {e}')
+    else:
+        # Não sobrescreve um cancelamento feito durante a execução
+        store.finish(job_id, result)
+
+# Pool local de processos por worker; o estado dos jobs fica no JobStore
+class JobManager:
+    def __init__(self, store, workers, max_pending, ttl, preload=()):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.preload = tuple(preload)
+        self._executor = None
+        self._executor_pid = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self):
+        return self.store is not None and self.workers > 0
+
+    def _pool(self):
+        """Pool criado no primeiro uso de cada worker (não é herdado do master do gunicorn).
+
+        O pool nasce dentro de uma requisição, com o worker já multithread (flusher
+        de métricas, threads do gthread, pool de views do modo ASGI): um fork ali
+        copiaria locks presos por outras threads e o processo filho travaria no
+        primeiro uso deles. Por isso os processos saem de um forkserver (spawn
+        onde não existe), que importa os módulos de `preload` uma vez só."""
+        if self._executor is None or self._executor_pid != os.getpid():
+            # Importado só quando o primeiro job chega (multiprocessing pesa na inicialização)
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(list(self.preload))
+            else:
+                context = multiprocessing.get_context('spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            self._executor_pid = os.getpid()
+            self._futures = {}
+        return self._executor
+
+    def submit(self, fn, *args):
+        """Agenda fn(*args) no pool e retorna o id do job"""
+        from concurrent.futures.process import BrokenProcessPool
+        with self._lock:
+            executor = self._pool()
+            if len(self._futures) >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFull('Too many pending jobs, try again later.')
+
+            job_id = self.store.create(self.ttl)
+            try:
+                future = executor.submit(run_job, self.store.path, job_id, fn, args)
+            except BrokenProcessPool:
+                # Um processo do pool morreu: recria o pool para os próximos jobs
+                logger.error("Job pool is broken, recreating it")
+                self._executor = None
+                future = self._pool().submit(run_job, self.store.path, job_id, fn, args)
+            self._futures[job_id] = future
+            self.submitted += 1
+
+        future.add_done_callback(lambda f, job_id=job_id: self._done(job_id, f))
+        return job_id
+
+    def _done(self, job_id, future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if not future.cancelled() and future.exception() is not None:
+            # Falha fora do job (processo morto, argumentos não serializáveis)
+            self.store.fail(job_id, f'Job worker crashed: {future.exception()}')
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancela o job; retorna o job atualizado ou None se não existir.
+        Jobs já em execução não são interrompidos, mas o resultado é descartado."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.cancel()
+        self.store.cancel(job_id)
+        return self.store.get(job_id)
+
+    def stats(self):
+        stats = {
+            'enabled': self.enabled,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'ttl_seconds': self.ttl
+        }
+        if not self.enabled:
+            return stats
+        with self._lock:
+            stats['pending'] = len(self._futures)
+        stats['submitted'] = self.submitted
+        stats['rejected'] = self.rejected
+        try:
+            stats['jobs'] = self.store.counts()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read job store: {e}")
+        return stats
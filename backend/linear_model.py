@@ -0,0 +1,253 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from text_features import compute_features
+
+logger = logging.getLogger(__name__)
+
+# Arquivo do modelo: cabeçalho de 32 bytes + pesos float32 little-endian,
+# mapeado em memória (as páginas são compartilhadas entre os workers)
+MODEL_MAGIC = b'EMLM'
+MODEL_VERSION = 1
+HEADER = struct.Struct('<4sIIIf12x')
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'linear_model.bin')
+
+LABELS = {'productive': 1, 'non-productive': 0, 'nonproductive': 0, '1': 1, '0': 0}
+TOKEN = re.compile(r"\w[\w']*")
+MASK32 = np.uint64(0xFFFFFFFF)
+
+# Features numéricas fora do texto, em posições fixas do espaço de hashing
+NUMERIC_FEATURES = ('__questions__', '__exclamations__', '__caps_ratio__', '__words__')
+
+def _mix(hashes):
+    """Finalizador do murmur3: espalha os bits antes de tirar índice e sinal"""
+    h = hashes & MASK32
+    h ^= h >> np.uint64(16)
+    h = (h * np.uint64(0x85EBCA6B)) & MASK32
+    h ^= h >> np.uint64(13)
+    h = (h * np.uint64(0xC2B2AE35)) & MASK32
+    h ^= h >> np.uint64(16)
+    return h
+
+# Bag-of-words com n-gramas no espaço de hashing (sem vocabulário)
+class HashingFeaturizer:
+    def __init__(self, n_features, ngram_max=2):
+        if n_features & (n_features - 1):
+            raise ValueError('n_features must be a power of two')
+        self.n_features = n_features
+        self.ngram_max = ngram_max
+        self._mask = np.uint64(n_features - 1)
+        numeric = _mix(np.array([zlib.crc32(name.encode()) for name in NUMERIC_FEATURES], dtype=np.uint64))
+        self.numeric_columns = (numeric & self._mask).astype(np.int64)
+
+    def _hash_tokens(self, text):
+        unigrams = np.array([zlib.crc32(token.encode('utf-8')) for token in TOKEN.findall(text.lower())],
+                            dtype=np.uint64)
+        grams = [unigrams]
+        combined = unigrams
+        # n-gramas combinando os hashes vizinhos, sem montar as strings
+        for n in range(2, self.ngram_max + 1):
+            if len(unigrams) < n:
+                break
+            combined = (combined[:-1] * np.uint64(0x9E3779B1) + unigrams[n - 1:] + np.uint64(n)) & MASK32
+            grams.append(combined)
+        return _mix(np.concatenate(grams))
+
+    def transform(self, docs):
+        """Matriz esparsa (linhas, colunas, valores) de registros com processed_text
+        e contagens; o texto é normalizado (L2) e as features numéricas somadas depois"""
+        rows, hashes = [], []
+        for i, doc in enumerate(docs):
+            doc_hashes = self._hash_tokens(doc.processed_text or '')
+            hashes.append(doc_hashes)
+            rows.append(np.full(len(doc_hashes), i, dtype=np.int64))
+
+        n_docs = len(docs)
+        if hashes:
+            hashes = np.concatenate(hashes)
+            rows = np.concatenate(rows)
+        else:
+            hashes = np.zeros(0, dtype=np.uint64)
+            rows = np.zeros(0, dtype=np.int64)
+
+        columns = (hashes & self._mask).astype(np.int64)
+        signs = np.where(hashes & np.uint64(0x80000000), -1.0, 1.0)
+
+        # Soma repetições do mesmo n-grama no documento
+        keys, inverse = np.unique(rows * self.n_features + columns, return_inverse=True)
+        values = np.bincount(inverse, weights=signs, minlength=len(keys))
+        rows, columns = keys // self.n_features, keys % self.n_features
+
+        norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n_docs))
+        values = values / np.where(norms > 0, norms, 1.0)[rows]
+
+        numeric = np.array([
+            (np.log1p(doc.question_count), np.log1p(doc.exclamation_count),
+             doc.caps_ratio, np.log1p(doc.word_count) / 5.0)
+            for doc in docs
+        ], dtype=np.float64).reshape(n_docs, len(NUMERIC_FEATURES))
+        numeric_rows = np.repeat(np.arange(n_docs, dtype=np.int64), len(NUMERIC_FEATURES))
+        numeric_columns = np.tile(self.numeric_columns, n_docs)
+
+        return (np.concatenate([rows, numeric_rows]),
+                np.concatenate([columns, numeric_columns]),
+                np.concatenate([values, numeric.ravel()]))
+
+def sparse_dot(matrix, weights, n_rows):
+    """Produto matriz esparsa x vetor de pesos, um score por linha"""
+    rows, columns, values = matrix
+    return np.bincount(rows, weights=weights[columns] * values, minlength=n_rows)
+
+def _sigmoid(scores):
+    return 1.0 / (1.0 + np.exp(-np.clip(scores, -35.0, 35.0)))
+
+# Regressão logística sobre features com hashing; pesos em arquivo mapeado em memória
+class HashedLinearModel:
+    def __init__(self, weights, bias, ngram_max, path=None, fingerprint=None):
+        self.weights = weights
+        self.bias = float(bias)
+        self.featurizer = HashingFeaturizer(len(weights), ngram_max)
+        self.path = path
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            digest = hashlib.blake2b(header, digest_size=8)
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        if len(header) < HEADER.size:
+            raise ValueError(f'{path}: truncated model header')
+        magic, version, n_features, ngram_max, bias = HEADER.unpack(header)
+        if magic != MODEL_MAGIC or version != MODEL_VERSION:
+            raise ValueError(f'{path}: not a linear model file (version {MODEL_VERSION})')
+
+        weights = np.memmap(path, dtype='<f4', mode='r', offset=HEADER.size, shape=(n_features,))
+        logger.info(f"Linear model loaded: {n_features} hashed features, {ngram_max}-grams")
+        return cls(weights, bias, ngram_max, path=path, fingerprint=digest.hexdigest())
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(HEADER.pack(MODEL_MAGIC, MODEL_VERSION, len(self.weights),
+                                self.featurizer.ngram_max, self.bias))
+            f.write(np.asarray(self.weights, dtype='<f4').tobytes())
+        os.replace(path + '.tmp', path)
+
+    def predict_proba(self, docs):
+        """Probabilidade de 'Productive' para cada registro do lote"""
+        matrix = self.featurizer.transform(docs)
+        return _sigmoid(sparse_dot(matrix, self.weights, len(docs)) + self.bias)
+
+    def info(self):
+        return {
+            'path': self.path,
+            'fingerprint': self.fingerprint,
+            'hashed_features': len(self.weights),
+            'ngram_max': self.featurizer.ngram_max,
+            'nonzero_weights': int(np.count_nonzero(self.weights))
+        }
+
+def train(docs, labels, n_features=2 ** 18, ngram_max=2, epochs=100, learning_rate=0.5, l2=1e-5):
+    """Regressão logística em lote com AdaGrad (taxa por feature, bom para dados esparsos)"""
+    featurizer = HashingFeaturizer(n_features, ngram_max)
+    matrix = featurizer.transform(docs)
+    rows, columns, values = matrix
+    y = np.asarray(labels, dtype=np.float64)
+    n = len(y)
+
+    weights = np.zeros(n_features, dtype=np.float64)
+    bias = 0.0
+    squared = np.zeros(n_features, dtype=np.float64)
+    bias_squared = 0.0
+    for _ in range(epochs):
+        error = _sigmoid(sparse_dot(matrix, weights, n) + bias) - y
+        gradient = np.bincount(columns, weights=values * error[rows], minlength=n_features) / n
+        gradient += l2 * weights
+        squared += gradient * gradient
+        weights -= learning_rate * gradient / (np.sqrt(squared) + 1e-8)
+
+        bias_gradient = float(error.mean())
+        bias_squared += bias_gradient * bias_gradient
+        bias -= learning_rate * bias_gradient / (bias_squared ** 0.5 + 1e-8)
+
+    return HashedLinearModel(weights.astype(np.float32), bias, ngram_max)
+
+def evaluate(model, docs, labels):
+    """Acurácia e log-loss do modelo em um conjunto rotulado"""
+    y = np.asarray(labels, dtype=np.float64)
+    probabilities = np.clip(model.predict_proba(docs), 1e-7, 1 - 1e-7)
+    accuracy = float(np.mean((probabilities > 0.5) == (y == 1)))
+    log_loss = float(-np.mean(y * np.log(probabilities) + (1 - y) * np.log(1 - probabilities)))
+    return {'examples': len(y), 'accuracy': round(accuracy, 4), 'log_loss': round(log_loss, 4)}
+
+def load_labeled(path):
+    """Lê um JSONL com {"text": ..., "label": "Productive" | "Non-Productive"}"""
+    docs, labels = [], []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            label = LABELS.get(str(entry.get('label', '')).strip().lower())
+            text = entry.get('text')
+            if label is None or not isinstance(text, str) or not text.strip():
+                raise ValueError(f'{path}:{number}: expected "text" and a Productive/Non-Productive "label"')
+            docs.append(compute_features(text.strip()))
+            labels.append(label)
+    return docs, labels
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python linear_model.py', description='Hashed linear model for email classification')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = commands.add_parser('train', help='train a model from labeled JSONL')
+    train_parser.add_argument('data')
+    train_parser.add_argument('--output', '-o', default=DEFAULT_MODEL_PATH)
+    train_parser.add_argument('--bits', type=int, default=18, help='hashed feature space size (2**bits)')
+    train_parser.add_argument('--ngrams', type=int, default=2)
+    train_parser.add_argument('--epochs', type=int, default=100)
+    train_parser.add_argument('--learning-rate', type=float, default=0.5)
+    train_parser.add_argument('--l2', type=float, default=1e-5)
+    train_parser.add_argument('--holdout', type=float, default=0.2, help='fraction kept for evaluation')
+    train_parser.add_argument('--seed', type=int, default=42)
+
+    evaluate_parser = commands.add_parser('evaluate', help='evaluate a saved model on labeled JSONL')
+    evaluate_parser.add_argument('data')
+    evaluate_parser.add_argument('--model', '-m', default=DEFAULT_MODEL_PATH)
+
+    args = parser.parse_args(argv)
+    docs, labels = load_labeled(args.data)
+
+    if args.command == 'evaluate':
+        print(json.dumps(evaluate(HashedLinearModel.load(args.model), docs, labels)))
+        return 0
+
+    order = list(range(len(docs)))
+    random.Random(args.seed).shuffle(order)
+    cut = int(len(order) * (1 - args.holdout)) if 0 < args.holdout < 1 else len(order)
+    train_idx, test_idx = order[:cut], order[cut:]
+
+    model = train([docs[i] for i in train_idx], [labels[i] for i in train_idx],
+                  n_features=2 ** args.bits, ngram_max=args.ngrams, epochs=args.epochs,
+                  learning_rate=args.learning_rate, l2=args.l2)
+    print(f"train:   {json.dumps(evaluate(model, [docs[i] for i in train_idx], [labels[i] for i in train_idx]))}")
+    if test_idx:
+        print(f"holdout: {json.dumps(evaluate(model, [docs[i] for i in test_idx], [labels[i] for i in test_idx]))}")
+    model.save(args.output)
+    print(f"Model written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import html
+import logging
+import re
+import shutil
+import tempfile
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+# Linha separadora do formato mbox ("From remetente data")
+MBOX_SEPARATOR = re.compile(rb'^From \S')
+# Linhas escapadas no corpo (mboxrd: ">From ", ">>From ", ...)
+MBOX_ESCAPED_FROM = re.compile(rb'^>(>*From )')
+HTML_TAGS = re.compile(r'<[^>]+>')
+HTML_SKIPPED = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+
+_parser = None
+
+def _message_parser():
+    """Parser de email criado no primeiro uso (email.policy é lento de importar)"""
+    global _parser
+    if _parser is None:
+        from email import policy
+        from email.parser import BytesParser
+        _parser = BytesParser(policy=policy.default)
+    return _parser
+
+# Leitura do mbox em pedaços de no máximo uma linha: linhas gigantes (sem quebra)
+# não são carregadas inteiras na memória
+MBOX_READ_CHUNK = 64 * 1024
+
+def iter_mbox_messages(stream, max_message_bytes):
+    """Gera (bytes da mensagem, truncada?) lendo o mbox linha a linha, sem carregar o arquivo"""
+    lines = []
+    size = 0
+    truncated = False
+    started = False
+    at_line_start = True
+
+    while True:
+        piece = stream.readline(MBOX_READ_CHUNK)
+        if not piece:
+            break
+        line_start, at_line_start = at_line_start, piece.endswith(b'\n')
+
+        # Separador e escape de "From " só valem no início de uma linha
+        if line_start and MBOX_SEPARATOR.match(piece):
+            if started:
+                yield b''.join(lines), truncated
+            lines, size, truncated, started = [], 0, False, True
+            continue
+        if not started:
+            continue  # lixo antes da primeira mensagem
+
+        if line_start and MBOX_ESCAPED_FROM.match(piece):
+            piece = piece[1:]
+        if size + len(piece) > max_message_bytes:
+            # Mantém o prefixo que cabe; o resto da mensagem é descartado
+            truncated = True
+            piece = piece[:max_message_bytes - size]
+            if not piece:
+                continue
+        lines.append(piece)
+        size += len(piece)
+
+    if started:
+        yield b''.join(lines), truncated
+
+def iter_zip_messages(fileobj, max_message_bytes):
+    """Gera (nome, bytes, truncada?) para cada .eml do zip, um membro por vez"""
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith('.eml'):
+                continue
+            with archive.open(info) as member:
+                # Lê um byte a mais para detectar truncamento (protege contra zip bombs)
+                data = member.read(max_message_bytes + 1)
+            yield info.filename, data[:max_message_bytes], len(data) > max_message_bytes
+
+def _part_text(part):
+    try:
+        content = part.get_content()
+    except (LookupError, UnicodeError, AssertionError):
+        payload = part.get_payload(decode=True) or b''
+        content = payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    return content
+
+def _html_to_text(markup):
+    return html.unescape(HTML_TAGS.sub(' ', HTML_SKIPPED.sub(' ', markup)))
+
+def message_to_text(message):
+    """Assunto + corpo em texto (text/plain, ou HTML limpo) + anexos de texto"""
+    plain, rich, attachments = [], [], []
+
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+        content_type = part.get_content_type()
+        filename = (part.get_filename() or '').lower()
+        is_attachment = part.get_content_disposition() == 'attachment'
+
+        if is_attachment:
+            if content_type.startswith('text/') or filename.endswith('.txt'):
+                attachments.append(_part_text(part))
+        elif content_type == 'text/plain':
+            plain.append(_part_text(part))
+        elif content_type == 'text/html':
+            rich.append(_html_to_text(_part_text(part)))
+
+    body = plain or rich
+    sections = [str(message.get('subject', '') or '')] + body + attachments
+    return '\n\n'.join(section.strip() for section in sections if section and section.strip())
+
+def parse_message(data):
+    """Converte os bytes de uma mensagem em (cabeçalhos resumidos, texto)"""
+    message = _message_parser().parsebytes(data)
+    headers = {
+        'message_id': str(message.get('message-id', '') or '') or None,
+        'subject': str(message.get('subject', '') or '') or None,
+        'from': str(message.get('from', '') or '') or None,
+        'date': str(message.get('date', '') or '') or None
+    }
+    return headers, message_to_text(message)
+
+def iter_archive_messages(stream, kind, max_message_bytes):
+    """Gera (origem, bytes, truncada?) de um arquivo .mbox ou .zip de .eml"""
+    if kind == 'mbox':
+        for number, (data, truncated) in enumerate(iter_mbox_messages(stream, max_message_bytes)):
+            yield f'message-{number}', data, truncated
+        return
+
+    # zip precisa de acesso aleatório: streams não pesquisáveis vão para um
+    # arquivo temporário (em disco acima de 1 MB)
+    seekable = getattr(stream, 'seekable', None)
+    if seekable is not None and seekable():
+        yield from iter_zip_messages(stream, max_message_bytes)
+        return
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        shutil.copyfileobj(stream, spool, 1024 * 1024)
+        spool.seek(0)
+        yield from iter_zip_messages(spool, max_message_bytes)
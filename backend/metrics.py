@@ -0,0 +1,215 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Cronômetro de uma etapa; registra a duração no histograma ao sair do bloco
+class _StageTimer:
+    __slots__ = ('registry', 'stage', 'started', 'elapsed')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.started
+        self.registry.observe('stage_seconds', self.elapsed, stage=self.stage)
+        return False
+
+# Contadores e histogramas em memória, exportados no formato texto do Prometheus.
+# Com `directory`, cada worker grava um snapshot próprio e o /metrics soma todos.
+class MetricsRegistry:
+    def __init__(self, prefix, directory=None, flush_interval=1.0):
+        self.prefix = prefix
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._definitions = {}
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._snapshot_name = _snapshot_name()
+        self._dirty = False
+        self._flusher_pid = None
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+
+    def counter(self, name, help_text):
+        self._definitions[name] = ('counter', help_text, None)
+
+    def histogram(self, name, help_text, buckets):
+        self._definitions[name] = ('histogram', help_text, tuple(buckets))
+
+    def inc(self, name, amount=1, **labels):
+        self._check_fork()
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._maybe_flush()
+
+    def observe(self, name, value, **labels):
+        self._check_fork()
+        buckets = self._definitions[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            data = self._histograms.get(key)
+            if data is None:
+                # contagens por bucket (não cumulativas), soma, total
+                data = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    data[0][i] += 1
+                    break
+            data[1] += value
+            data[2] += 1
+        self._maybe_flush()
+
+    def stage(self, stage):
+        return _StageTimer(self, stage)
+
+    def reset(self):
+        """Descarta os dados deste processo (ex.: após o aquecimento na inicialização)"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), [list(data[0]), data[1], data[2]]]
+                               for (name, labels), data in self._histograms.items()]
+            }
+
+    def _check_fork(self):
+        """Após o fork o worker começa do zero (evita contar duas vezes os dados do master)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                self._counters.clear()
+                self._histograms.clear()
+                self._pid = os.getpid()
+                self._snapshot_name = _snapshot_name()
+
+    def _maybe_flush(self):
+        if not self.directory:
+            return
+        self._dirty = True
+        if self._flusher_pid != os.getpid():
+            # Threads não sobrevivem ao fork: cada worker inicia a sua
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        """Grava o snapshot deste worker (escrita atômica)"""
+        if not self.directory:
+            return
+        self._dirty = False
+        try:
+            self._check_fork()
+            path = os.path.join(self.directory, self._snapshot_name)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self._snapshot(), f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+
+    def _collect(self):
+        """Soma os snapshots de todos os workers (ou só o deste processo)"""
+        if not self.directory:
+            snapshots = [self._snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, (buckets, total, count) in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+                merged[1] += total
+                merged[2] += count
+        return counters, histograms
+
+    def render(self):
+        """Exposição no formato texto do Prometheus (version 0.0.4)"""
+        counters, histograms = self._collect()
+        lines = []
+        for name, (kind, help_text, buckets) in self._definitions.items():
+            full_name = f'{self.prefix}_{name}'
+            lines.append(f'# HELP {full_name} {help_text}')
+            lines.append(f'# TYPE {full_name} {kind}')
+
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{full_name}{_format_labels(labels)} {value}')
+                continue
+
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{full_name}_bucket{_format_labels(labels + (("le", repr(float(bound))),))} {cumulative}')
+                lines.append(f'{full_name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{full_name}_sum{_format_labels(labels)} {total}')
+                lines.append(f'{full_name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+def _snapshot_name():
+    """Nome único por processo: um worker novo que reutiliza o PID de um morto
+    não sobrescreve o snapshot dele (o total não diminui)"""
+    return f'worker-{os.getpid()}-{uuid.uuid4().hex[:12]}.json'
+
+def clear_snapshots(directory):
+    """Remove os snapshots de execuções anteriores; chamado pelo master ao iniciar,
+    antes dos workers"""
+    removed = 0
+    for path in glob.glob(os.path.join(directory, 'worker-*.json*')):
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
@@ -0,0 +1,107 @@
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+TOKEN = re.compile(r'\w+')
+# Números (tickets, datas, valores) não diferenciam emails de um mesmo template
+DIGITS = re.compile(r'\d+')
+SHIFTS = np.arange(64, dtype=np.uint64)
+SHINGLE_SIZE = 3
+
+def _splitmix64(values):
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+def simhash(text):
+    """SimHash de 64 bits sobre trigramas de palavras; textos parecidos diferem em poucos bits"""
+    tokens = TOKEN.findall(DIGITS.sub('0', text.lower()))
+    hashes = np.array([zlib.crc32(token.encode('utf-8')) for token in tokens], dtype=np.uint64)
+    if len(hashes) >= SHINGLE_SIZE:
+        prime = np.uint64(1000003)
+        hashes = (hashes[:-2] * prime + hashes[1:-1]) * prime + hashes[2:]
+    if not len(hashes):
+        return 0
+
+    bits = (_splitmix64(hashes)[:, None] >> SHIFTS) & np.uint64(1)
+    majority = bits.sum(axis=0) * 2 > len(hashes)
+    return int(np.bitwise_or.reduce(majority.astype(np.uint64) << SHIFTS))
+
+# Índice LSH de SimHash: com max_distance + 1 faixas de bits, dois fingerprints
+# a até max_distance bits de distância coincidem em pelo menos uma faixa
+class NearDuplicateIndex:
+    def __init__(self, max_entries, similarity=0.87, min_words=20):
+        self.max_entries = max_entries
+        self.max_distance = min(63, int((1.0 - similarity) * 64))
+        self.min_words = min_words
+
+        bands = self.max_distance + 1
+        bounds = [round(i * 64 / bands) for i in range(bands + 1)]
+        self._bands = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self._tables = [{} for _ in self._bands]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _keys(self, fingerprint):
+        return [(fingerprint >> start) & mask for start, mask in self._bands]
+
+    def lookup(self, fingerprint):
+        """Retorna (valor, distância em bits) do vizinho mais próximo ou None"""
+        best = None
+        with self._lock:
+            for table, key in zip(self._tables, self._keys(fingerprint)):
+                for candidate in table.get(key, ()):
+                    distance = (candidate ^ fingerprint).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (candidate, distance)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best[0])
+            return self._entries[best[0]], best[1]
+
+    def add(self, fingerprint, value):
+        with self._lock:
+            if fingerprint in self._entries:
+                self._entries[fingerprint] = value
+                self._entries.move_to_end(fingerprint)
+                return
+            self._entries[fingerprint] = value
+            for table, key in zip(self._tables, self._keys(fingerprint)):
+                table.setdefault(key, set()).add(fingerprint)
+
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                for table, key in zip(self._tables, self._keys(oldest)):
+                    bucket = table[key]
+                    bucket.discard(oldest)
+                    if not bucket:
+                        del table[key]
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'max_distance_bits': self.max_distance,
+                'min_words': self.min_words,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,193 @@
+import cProfile
+import hmac
+import json
+import logging
+import os
+import pstats
+import random
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TRACE_SUFFIX = '.folded'
+PSTATS_SUFFIX = '.prof'
+META_SUFFIX = '.json'
+
+# Limites da conversão para pilhas: evita explosão em grafos de chamada grandes
+MAX_STACK_DEPTH = 64
+MIN_STACK_MICROSECONDS = 1
+
+def _frame_label(func):
+    filename, line, name = func
+    if filename == '~':
+        # Funções embutidas: "<built-in method time.sleep>"
+        return name.strip('<>').replace(' ', '_').replace(';', ',')
+    return f'{name} ({os.path.basename(filename)}:{line})'.replace(';', ',')
+
+def collapsed_stacks(stats):
+    """Converte as estatísticas do cProfile para pilhas colapsadas
+    ("a;b;c <microssegundos>"), lidas por flamegraph.pl, speedscope e inferno.
+
+    O cProfile guarda só arestas chamador -> chamado, então o tempo de cada
+    função é repartido entre os chamadores na proporção do tempo de cada
+    aresta (aproximação usada também pelo flameprof)."""
+    entries = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, entry in entries.items() if not entry[4]]
+    folded = {}
+
+    def walk(func, stack, scale):
+        _, _, own_time, total_time, _ = entries[func]
+        stack = stack + (_frame_label(func),)
+        own = int(own_time * scale * 1e6)
+        if own >= MIN_STACK_MICROSECONDS:
+            key = ';'.join(stack)
+            folded[key] = folded.get(key, 0) + own
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = entries[callee][3]
+            # Recursão: a função já está na pilha e seu tempo já foi contado
+            if callee_total <= 0 or _frame_label(callee) in stack:
+                continue
+            share = scale * edge_time / callee_total
+            if share * callee_total * 1e6 >= MIN_STACK_MICROSECONDS:
+                walk(callee, stack, share)
+
+    for root in roots:
+        walk(root, (), 1.0)
+    return '\n'.join(f'{stack} {value}' for stack, value in sorted(folded.items())) + '\n'
+
+# Perfil de uma requisição: None quando a requisição não foi escolhida
+class _Capture:
+    __slots__ = ('profiler', 'reason', 'started')
+
+    def __init__(self, reason):
+        self.profiler = cProfile.Profile()
+        self.reason = reason
+        self.started = time.perf_counter()
+
+# Profiling sob demanda: por header com token ou por amostragem. Os traces
+# ficam num diretório local com no máximo max_traces entradas (as mais antigas
+# saem primeiro), compartilhado entre os workers
+class RequestProfiler:
+    def __init__(self, directory, token='', sample_rate=0.0, slow_ms=0.0, max_traces=50):
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_traces = max_traces
+        self.captured = 0
+        self.skipped = 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return bool(self.directory) and self.max_traces > 0 and (bool(self.token) or self.sample_rate > 0)
+
+    def authorized(self, token):
+        return bool(self.token) and bool(token) and hmac.compare_digest(token, self.token)
+
+    def start(self, header_token=None):
+        """Decide se a requisição será perfilada e liga o cProfile"""
+        if self.authorized(header_token):
+            reason = 'header'
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = 'sample'
+        else:
+            return None
+
+        capture = _Capture(reason)
+        try:
+            capture.profiler.enable()
+        except ValueError:
+            # Outro profiler já ativo no processo (Python 3.12+ permite um só)
+            self.skipped += 1
+            return None
+        return capture
+
+    def stop(self, capture, **info):
+        """Desliga o cProfile e grava o trace; amostras abaixo de slow_ms são
+        descartadas. Retorna o id do trace ou None"""
+        capture.profiler.disable()
+        duration_ms = (time.perf_counter() - capture.started) * 1000
+        if capture.reason == 'sample' and duration_ms < self.slow_ms:
+            return None
+
+        trace_id = f'{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}'
+        base = os.path.join(self.directory, trace_id)
+        try:
+            stats = pstats.Stats(capture.profiler)
+            stats.dump_stats(base + PSTATS_SUFFIX)
+            with open(base + TRACE_SUFFIX, 'w', encoding='utf-8') as f:
+                f.write(collapsed_stacks(stats))
+            meta = {
+                'id': trace_id,
+                'created_at': time.time(),
+                'duration_ms': round(duration_ms, 2),
+                'reason': capture.reason,
+                'pid': os.getpid(),
+                **info
+            }
+            # Metadados por último: a entrada só aparece no índice quando completa
+            with open(base + META_SUFFIX, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        except OSError as e:
+            logger.warning(f"Could not write profile trace: {e}")
+            return None
+
+        self.captured += 1
+        self._rotate()
+        return trace_id
+
+    def _trace_ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        # Os ids começam pelo timestamp em ms: ordem de nome = ordem de criação
+        return sorted(name[:-len(META_SUFFIX)] for name in names if name.endswith(META_SUFFIX))
+
+    def _rotate(self):
+        trace_ids = self._trace_ids()
+        for trace_id in trace_ids[:max(0, len(trace_ids) - self.max_traces)]:
+            for suffix in (META_SUFFIX, TRACE_SUFFIX, PSTATS_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.directory, trace_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def index(self):
+        """Traces guardados, do mais recente ao mais antigo"""
+        traces = []
+        for trace_id in reversed(self._trace_ids()):
+            try:
+                with open(os.path.join(self.directory, trace_id + META_SUFFIX), encoding='utf-8') as f:
+                    traces.append(json.load(f))
+            except (OSError, ValueError):
+                # Removido por outro worker durante a leitura
+                continue
+        return traces
+
+    def trace_path(self, trace_id, suffix=TRACE_SUFFIX):
+        # O id vem da URL: só aceita nomes que o próprio profiler gera
+        if not trace_id or not all(c.isalnum() or c == '-' for c in trace_id):
+            return None
+        path = os.path.join(self.directory, trace_id + suffix)
+        return path if os.path.exists(path) else None
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_ms,
+            'max_traces': self.max_traces,
+            'captured': self.captured,
+            'skipped': self.skipped
+        }
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlite_store import SQLiteConnections
+
+logger = logging.getLogger(__name__)
+
+def text_digest(text):
+    """Digest estável do texto (igual em todos os workers e processos)"""
+    return hashlib.blake2b(text.encode('utf-8', errors='surrogatepass'), digest_size=16).hexdigest()
+
+# Backend compartilhado em disco: todos os workers do gunicorn usam o mesmo arquivo
+class SQLiteCacheBackend:
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._db = SQLiteConnections(path)
+        self._writes = 0
+
+        conn = self._db.connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS results '
+            '(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload BLOB NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS results_expires ON results (expires_at)')
+        conn.commit()
+
+    def get(self, key):
+        row = self._db.connection().execute(
+            'SELECT expires_at, payload FROM results WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def set(self, key, expires_at, payload):
+        conn = self._db.connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO results (key, expires_at, payload) VALUES (?, ?, ?)',
+            (key, expires_at, payload)
+        )
+        conn.commit()
+
+        # Limpeza periódica: remove expirados e os mais antigos acima do limite
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self.prune()
+
+    def prune(self):
+        conn = self._db.connection()
+        removed = conn.execute('DELETE FROM results WHERE expires_at <= ?', (time.time(),)).rowcount
+        removed += conn.execute(
+            'DELETE FROM results WHERE key IN ('
+            'SELECT key FROM results ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        ).rowcount
+        conn.commit()
+        return removed
+
+# Cache LRU + TTL limitado por memória, com backend compartilhado opcional
+class ResultCache:
+    def __init__(self, max_bytes, ttl, backend=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        """Retorna o valor salvo para a chave ou None"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[1])
+                self._remove(key)
+                self.evictions += 1
+
+        if self.backend is not None:
+            try:
+                entry = self.backend.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared result cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store(key, entry[0], entry[1])
+                return json.loads(entry[1])
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+
+        payload = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, expires_at, payload)
+
+        if self.backend is not None:
+            try:
+                self.backend.set(key, expires_at, payload)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared result cache write failed: {e}")
+
+    def _store(self, key, expires_at, payload):
+        if len(payload) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, payload)
+        self._bytes += len(payload)
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'backend': 'sqlite' if self.backend is not None else 'memory',
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,221 @@
+import importlib.util
+import logging
+import os
+import re
+import sys
+
+from text_features import preprocess_text
+
+logger = logging.getLogger(__name__)
+
+# Léxico compacto derivado do en-sentiment.xml do Pattern/TextBlob (licença PDDL)
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment_lexicon.tsv')
+
+# Tokenização equivalente à do Pattern para o texto já pré-processado
+PUNCTUATION = ".,;:!?()[]{}`''\"@#$^&*+-|=~_"
+SPLIT_PUNCTUATION = tuple(PUNCTUATION.replace('.', ''))
+TRAILING_PUNCTUATION = SPLIT_PUNCTUATION + ('.',)
+ABBREVIATIONS = frozenset((
+    'a.', 'adj.', 'adv.', 'al.', 'a.m.', 'c.', 'cf.', 'comp.', 'conf.', 'def.',
+    'ed.', 'e.g.', 'esp.', 'etc.', 'ex.', 'f.', 'fig.', 'gen.', 'id.', 'i.e.',
+    'int.', 'l.', 'm.', 'Med.', 'Mil.', 'Mr.', 'n.', 'n.q.', 'orig.', 'pl.',
+    'pred.', 'pres.', 'p.m.', 'ref.', 'v.', 'vs.', 'w/'
+))
+RE_ABBREVIATION = re.compile(r'^[A-Za-z]\.$|^(?:[A-Za-z]\.)+$|^[A-Z][bcdfghjklmnpqrstvwxz|]+.$')
+NEGATIONS = frozenset(('no', 'not', "n't", 'never'))
+
+def textblob_installed():
+    """Verifica se o TextBlob está instalado sem importá-lo"""
+    return importlib.util.find_spec('textblob') is not None
+
+def iter_tokens(text):
+    """Separa palavras e pontuação como o tokenizador do Pattern"""
+    for token in text.split():
+        while token.startswith(SPLIT_PUNCTUATION):
+            yield token[0]
+            token = token[1:]
+
+        tail = []
+        while token.endswith(TRAILING_PUNCTUATION):
+            if token.endswith(SPLIT_PUNCTUATION):
+                tail.append(token[-1])
+                token = token[:-1]
+            if token.endswith('...'):
+                tail.append('...')
+                token = token[:-3].rstrip('.')
+            if token.endswith('.'):
+                if token in ABBREVIATIONS or RE_ABBREVIATION.match(token):
+                    break
+                tail.append('.')
+                token = token[:-1]
+
+        if token:
+            yield token
+        yield from reversed(tail)
+
+# Motor de sentimento por léxico: tabela pré-calculada e uma passada pelos tokens
+class LexiconSentiment:
+    name = 'lexicon'
+
+    def __init__(self, path=LEXICON_PATH):
+        self.words = {}
+        self.emoticons = {}
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                word, polarity, subjectivity, intensity, flag = line.rstrip('\n').split('\t')
+                if flag == 'e':
+                    self.emoticons[word] = float(polarity)
+                else:
+                    self.words[word] = (float(polarity), float(subjectivity), float(intensity), flag == 'm')
+
+        logger.info(f"Sentiment lexicon loaded: {len(self.words)} words")
+
+    def analyze(self, text):
+        """Retorna (polaridade, subjetividade) com as regras de modificador e negação do Pattern"""
+        assessments = []  # [polaridade, subjetividade, intensidade, negado]
+        modifier = None
+        negation = None
+
+        for token in iter_tokens(text):
+            word = token.lower()
+            entry = self.words.get(word)
+
+            if entry is not None:
+                polarity, subjectivity, intensity, is_modifier = entry
+                if modifier is None:
+                    # Palavra conhecida ("good")
+                    assessments.append([polarity, subjectivity, intensity, False])
+                else:
+                    # Palavra precedida de modificador ("really good")
+                    last = assessments[-1]
+                    last[0] = max(-1.0, min(polarity * last[2], 1.0))
+                    last[1] = max(-1.0, min(subjectivity * last[2], 1.0))
+                    last[2] = intensity
+                if negation is not None:
+                    # Palavra precedida de negação ("not really good")
+                    last = assessments[-1]
+                    last[2] = 1.0 / last[2]
+                    last[3] = True
+                modifier = word if is_modifier else None
+                negation = word if word in NEGATIONS else None
+                continue
+
+            # Palavra desconhecida pode ser negação ("not good"); a negação
+            # atravessa palavras curtas ("not a good")
+            if word in NEGATIONS:
+                negation = word
+            elif negation and len(word.strip("'")) > 1:
+                negation = None
+
+            if negation is not None and modifier is not None and modifier.endswith('ly'):
+                # Negação precedida de modificador ("really not good")
+                assessments[-1][3] = True
+                negation = None
+            elif modifier and len(word) > 2:
+                modifier = None
+
+            # Exclamação reforça a palavra anterior
+            if word == '!' and assessments:
+                assessments[-1][0] = max(-1.0, min(assessments[-1][0] * 1.25, 1.0))
+
+            if not word.isalpha() and len(word) <= 5 and word not in PUNCTUATION:
+                emoticon = self.emoticons.get(word)
+                if emoticon is not None:
+                    assessments.append([emoticon, 1.0, 1.0, False])
+
+        if not assessments:
+            return 0.0, 0.0
+
+        # "not good" = levemente ruim, "not bad" = levemente bom
+        polarity = sum(a[0] * -0.5 if a[3] else a[0] for a in assessments)
+        subjectivity = sum(a[1] for a in assessments)
+        return polarity / float(len(assessments)), subjectivity / float(len(assessments))
+
+# Implementação de referência com TextBlob (importado apenas no primeiro uso)
+class TextBlobSentiment:
+    name = 'textblob'
+
+    def __init__(self):
+        self._textblob = None
+
+    def analyze(self, text):
+        if self._textblob is None:
+            from textblob import TextBlob
+            self._textblob = TextBlob
+        sentiment = self._textblob(text).sentiment
+        return sentiment.polarity, sentiment.subjectivity
+
+def create_sentiment_engine(name):
+    """Cria o motor de sentimento configurado ('lexicon', 'textblob' ou 'none')"""
+    name = (name or 'lexicon').lower()
+    if name == 'none':
+        return None
+    if name == 'textblob':
+        if textblob_installed():
+            return TextBlobSentiment()
+        logger.warning("TextBlob not installed, falling back to lexicon sentiment engine")
+    elif name != 'lexicon':
+        logger.warning(f"Unknown sentiment engine '{name}', using lexicon")
+
+    try:
+        return LexiconSentiment()
+    except OSError as e:
+        logger.error(f"Could not load sentiment lexicon: {e}")
+        return None
+
+def export_lexicon(path=LEXICON_PATH):
+    """Gera o léxico compacto a partir do TextBlob instalado"""
+    from textblob._text import EMOTICONS
+    from textblob.en import sentiment as pattern_sentiment
+
+    pattern_sentiment.load()
+    lines = [
+        '# Derived from textblob/en/en-sentiment.xml (Pattern, Tom De Smedt & Walter Daelemans, PDDL).',
+        '# word<TAB>polarity<TAB>subjectivity<TAB>intensity<TAB>flag (m = modifier, e = emoticon, - = none)'
+    ]
+    for word, senses in sorted(dict.items(pattern_sentiment)):
+        polarity, subjectivity, intensity = senses[None]
+        flag = 'm' if 'RB' in senses else '-'
+        lines.append(f"{word}\t{polarity!r}\t{subjectivity!r}\t{intensity!r}\t{flag}")
+
+    emoticons = {}
+    for (_, polarity), faces in EMOTICONS.items():
+        for face in sorted(faces):
+            emoticons.setdefault(face.lower(), polarity)
+    for face, polarity in sorted(emoticons.items()):
+        lines.append(f"{face}\t{polarity!r}\t1.0\t1.0\te")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return len(lines) - 2
+
+def compare_engines(paths):
+    """Compara lexicon e TextBlob nos arquivos de exemplo; retorna o número de divergências"""
+    lexicon = LexiconSentiment()
+    reference = TextBlobSentiment()
+    mismatches = 0
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            text = preprocess_text(f.read())
+        expected = tuple(round(v, 3) for v in reference.analyze(text))
+        actual = tuple(round(v, 3) for v in lexicon.analyze(text))
+        status = 'ok' if actual == expected else 'MISMATCH'
+        mismatches += actual != expected
+        print(f"{status:8} {os.path.basename(path)}: lexicon={actual} textblob={expected}")
+    return mismatches
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--export-lexicon']:
+        print(f"Exported {export_lexicon()} entries to {LEXICON_PATH}")
+    elif sys.argv[1:2] == ['--compare']:
+        files = sys.argv[2:] or [
+            os.path.join(os.path.dirname(LEXICON_PATH), '..', 'examples', name)
+            for name in sorted(os.listdir(os.path.join(os.path.dirname(LEXICON_PATH), '..', 'examples')))
+        ]
+        sys.exit(1 if compare_engines(files) else 0)
+    else:
+        print("Usage: python sentiment.py --export-lexicon | --compare [files...]")
+        sys.exit(2)
@@ -0,0 +1,87 @@
+import gzip
+import importlib.util
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Dependências opcionais: orjson acelera o JSON e msgpack habilita o formato
+# binário; sem elas as respostas continuam em JSON da biblioteca padrão
+if importlib.util.find_spec('orjson') is not None:
+    import orjson
+
+    def encode_json(data):
+        try:
+            return orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            # orjson recusa inteiros acima de 64 bits (ex.: "id" enviado pelo
+            # cliente no lote), que são JSON válido: usa a biblioteca padrão
+            return _encode_json_stdlib(data)
+else:
+    orjson = None
+
+    def encode_json(data):
+        return _encode_json_stdlib(data)
+
+def _encode_json_stdlib(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+_msgpack = None
+
+def msgpack_installed():
+    return importlib.util.find_spec('msgpack') is not None
+
+def encode_msgpack(data):
+    global _msgpack
+    if _msgpack is None:
+        import msgpack
+        _msgpack = msgpack
+    return _msgpack.packb(data, use_bin_type=True)
+
+def negotiate(accept_mimetypes):
+    """Escolhe o formato pela preferência do cliente (Accept); JSON por padrão"""
+    offered = [JSON_MIMETYPE] + (list(MSGPACK_MIMETYPES) if msgpack_installed() else [])
+    return accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+
+def encode(data, mimetype):
+    """Retorna (corpo, mimetype); MessagePack que não cabe no formato (inteiros
+    acima de 64 bits) sai em JSON"""
+    if mimetype in MSGPACK_MIMETYPES:
+        try:
+            return encode_msgpack(data), mimetype
+        except OverflowError:
+            pass
+    return encode_json(data), JSON_MIMETYPE
+
+def parse_fields(raw):
+    """'classification,confidence,analysis_details.method' -> caminhos; None = tudo"""
+    if not raw:
+        return None
+    fields = [tuple(field.strip().split('.')) for field in raw.split(',') if field.strip()]
+    return fields or None
+
+def project(data, fields):
+    """Mantém só os campos pedidos (caminhos com ponto entram em objetos aninhados);
+    campos inexistentes são ignorados"""
+    if fields is None:
+        return data
+
+    projected = {}
+    for path in fields:
+        value = data
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = projected
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+    return projected
+
+def gzip_body(body, level=5):
+    return gzip.compress(body, compresslevel=level)
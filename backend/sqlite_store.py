@@ -0,0 +1,23 @@
+import os
+import sqlite3
+import threading
+
+# Conexões SQLite em WAL compartilhadas entre os workers do gunicorn (e os
+# processos do pool de jobs) que abrem o mesmo arquivo
+class SQLiteConnections:
+    def __init__(self, path, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def connection(self):
+        """Uma conexão por thread e por processo (conexões não sobrevivem ao fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
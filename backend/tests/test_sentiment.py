@@ -0,0 +1,29 @@
+import glob
+import os
+
+import pytest
+
+from sentiment import LexiconSentiment, textblob_installed
+from text_features import preprocess_text
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', '..', 'examples', '*.txt')))
+
+@pytest.fixture(scope='module')
+def engines():
+    if not textblob_installed():
+        pytest.skip('textblob is not installed')
+    from sentiment import TextBlobSentiment
+    return LexiconSentiment(), TextBlobSentiment()
+
+def test_examples_are_bundled():
+    assert EXAMPLES
+
+@pytest.mark.parametrize('path', EXAMPLES, ids=os.path.basename)
+def test_lexicon_matches_textblob_on_examples(engines, path):
+    lexicon, reference = engines
+    with open(path, encoding='utf-8') as f:
+        text = preprocess_text(f.read())
+
+    expected = tuple(round(value, 3) for value in reference.analyze(text))
+    actual = tuple(round(value, 3) for value in lexicon.analyze(text))
+    assert actual == expected
@@ -0,0 +1,80 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# O pré-processamento mantém só as primeiras MAX_PROCESSED_WORDS palavras
+MAX_PROCESSED_WORDS = 400
+DEFAULT_FEATURE_WINDOW_CHARS = 64 * 1024
+
+# Caracteres removidos na limpeza (mantém pontuação importante)
+NON_TEXT_CHARS = re.compile(r'[^\w\s.,!?-]')
+
+def feature_window_chars():
+    """Janela de caracteres das features (FEATURE_WINDOW_CHARS); lida na chamada
+    para respeitar o .env carregado pelo app"""
+    return int(os.environ.get('FEATURE_WINDOW_CHARS', DEFAULT_FEATURE_WINDOW_CHARS))
+
+def preprocess_text(text):
+    """Pré-processamento robusto do texto"""
+    try:
+        if not text or not isinstance(text, str):
+            return ""
+
+        # Limpar texto básico e colapsar espaços; limitar tamanho para modelos
+        # Transformers (512 tokens) sem montar a lista de todas as palavras
+        words = NON_TEXT_CHARS.sub(' ', text).split(None, MAX_PROCESSED_WORDS)
+        return ' '.join(words[:MAX_PROCESSED_WORDS])
+    except Exception as e:
+        logger.error(f"Error preprocessing text: {e}")
+        return str(text) if text else ""
+
+# Registro compacto com as features de um email, reutilizado pelo classificador
+# e pela montagem da resposta
+class EmailFeatures:
+    __slots__ = (
+        'text_length', 'text_lower', 'processed_text', 'processed_words',
+        'word_count', 'question_count', 'exclamation_count', 'caps_ratio',
+        'productive_keywords', 'nonproductive_keywords', 'pattern_matches',
+        'sentiment_polarity', 'subjectivity'
+    )
+
+    def analysis_details(self):
+        """Detalhes da análise no formato retornado pela API"""
+        details = {}
+        if self.sentiment_polarity is not None:
+            details['sentiment_polarity'] = round(self.sentiment_polarity, 3)
+            details['subjectivity'] = round(self.subjectivity, 3)
+        details.update({
+            'productive_keywords': self.productive_keywords,
+            'nonproductive_keywords': self.nonproductive_keywords,
+            'pattern_matches': self.pattern_matches,
+            'word_count': self.word_count,
+            'question_count': self.question_count,
+            'exclamation_count': self.exclamation_count,
+            'caps_ratio': round(self.caps_ratio, 3)
+        })
+        return details
+
+def compute_features(text, window_chars=None):
+    """Features estruturais sobre uma janela limitada do texto; palavras-chave e
+    sentimento ficam para o classificador"""
+    window = text[:window_chars if window_chars is not None else feature_window_chars()]
+    processed_text = preprocess_text(window)
+
+    features = EmailFeatures()
+    features.text_length = len(text)
+    features.text_lower = window.lower()
+    features.processed_text = processed_text
+    features.processed_words = processed_text.count(' ') + 1 if processed_text else 0
+    features.word_count = len(window.split())
+    features.question_count = window.count('?')
+    features.exclamation_count = window.count('!')
+    features.caps_ratio = sum(map(str.isupper, window)) / max(len(window), 1)
+    features.productive_keywords = None
+    features.nonproductive_keywords = None
+    features.pattern_matches = None
+    features.sentiment_polarity = None
+    features.subjectivity = None
+    return features